@@ -0,0 +1,95 @@
+"""
+Reports memory taken by the instruments frame (bytes per instrument)
+before and after :func:`scrapers.compact.compact_instruments`.
+
+Usage:
+    python -m benchmarks.instruments_memory [--rows N]
+    python -m benchmarks.instruments_memory --config data/scraper_config.yml
+
+With --config the latest trade results are downloaded from the exchange,
+otherwise synthetic instruments are generated.
+
+Note that pandas counts every python string separately, so interned
+names are not reflected in the numbers (actual savings are bigger).
+"""
+
+import argparse
+import asyncio
+import random
+
+import numpy as np
+import pandas as pd
+
+from scrapers.compact import compact_instruments, memory_per_row
+
+
+def generate_instruments(num_rows: int, num_bases: int = 300,
+                         seed: int = 0) -> pd.DataFrame:
+    """
+    :return: instruments frame shaped as returned by
+    :meth:`TradeResultsScraper.get_all_instruments`
+    """
+
+    rng = random.Random(seed)
+    bases = [f'ст. Станция-{i}' for i in range(num_bases)]
+    fuels = ['A592', 'A595', 'DSC5', 'DTA5', 'DTZ5', 'DTL5', 'MAZ1', 'TS1Z']
+
+    rows = []
+    for i in range(num_rows):
+        fuel = rng.choice(fuels)
+        basis = rng.randrange(num_bases)
+        # strings are built at runtime like the ones read from xls file,
+        # so equal values are different objects
+        rows.append((
+            ''.join((fuel, f'{basis:03d}', 'F')),
+            ''.join(('Топливо ', fuel, ', ', bases[basis])),
+            ''.join(('ст. Станция-', str(basis))),
+            rng.choice((np.nan, round(rng.uniform(30000, 90000), 2))),
+            rng.choice((np.nan, round(rng.uniform(-2000, 2000), 2))),
+        ))
+
+    return pd.DataFrame(rows, columns=[
+        'Код Инструмента',
+        'Наименование Инструмента',
+        'Базис поставки',
+        'Цена (за единицу измерения), руб - Средневзвешенная',
+        'Изменение рыночной цены к цене предыдуего дня, руб'
+    ])
+
+
+async def download_instruments(config_file_path: str) -> pd.DataFrame:
+    from scrapers.trade_results_scraper import TradeResultsScraper
+    from scrapers.utils import load_scraper_config
+
+    scraper = TradeResultsScraper(load_scraper_config(config_file_path))
+    try:
+        return await scraper.get_all_instruments()
+    finally:
+        await scraper.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=5000,
+                        help='number of synthetic instruments')
+    parser.add_argument('--config', type=str,
+                        help='scraper config to download real trade results')
+    args = parser.parse_args()
+
+    if args.config:
+        instruments = asyncio.run(download_instruments(args.config))
+    else:
+        instruments = generate_instruments(args.rows)
+    compact = compact_instruments(instruments)
+
+    before = memory_per_row(instruments)
+    after = memory_per_row(compact)
+    print(f'instruments: {instruments.shape[0]}')
+    print(f'before: {before:.1f} bytes/instrument')
+    print(f'after:  {after:.1f} bytes/instrument')
+    if after:
+        print(f'ratio:  {before / after:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
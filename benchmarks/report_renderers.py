@@ -0,0 +1,113 @@
+"""
+Compares render time and size of report formats (see bot/renderers.py).
+
+Usage:
+    python -m benchmarks.report_renderers [--rows N] [--repeat R]
+    python -m benchmarks.report_renderers --bot-token TOKEN --chat-id ID
+
+With --bot-token and --chat-id every format is also sent to the chat
+and send time is measured.
+"""
+
+import argparse
+import asyncio
+import io
+import random
+from time import perf_counter
+
+import pandas as pd
+
+from bot.renderers import FILE_RENDERERS, DEPARTURE_STATIONS_TEXT_COLUMNS, \
+    render_text
+from .instruments_memory import generate_instruments
+
+
+def generate_departure_stations_report(num_rows: int,
+                                       seed: int = 0) -> pd.DataFrame:
+    """
+    :return: report shaped as returned by
+    :meth:`DepartureStationsReporter.get_report`
+    """
+
+    rng = random.Random(seed)
+    report = generate_instruments(num_rows, seed=seed)
+    report['Название станции (как в калькуляторе)'] = \
+        report['Базис поставки'].str[4:]
+    report['Название топлива (как в калькуляторе)'] = 'БЕНЗИН'
+    report['Вес топлива (проставляемый в калькуляторе)'] = 60
+    report['РЖД тариф'] = [rng.uniform(1000, 9000) for _ in range(num_rows)]
+    report['РЖД тариф + 10%'] = report['РЖД тариф'] * 1.1
+    report['Итого'] = report['Цена (за единицу измерения), руб - Средневзвешенная'] \
+        + report['РЖД тариф + 10%']
+    return report.sort_values(by='Итого', na_position='last')
+
+
+def render(report: pd.DataFrame, report_format: str):
+    if report_format == 'text':
+        text = render_text(report, columns=DEPARTURE_STATIONS_TEXT_COLUMNS)
+        return text.encode('utf-8')
+    renderer, _ = FILE_RENDERERS[report_format]
+    return renderer(report)
+
+
+async def send(bot_token: str, chat_id: int,
+               payloads: dict[str, bytes]) -> dict[str, float]:
+    from aiogram import Bot, types
+
+    bot = Bot(bot_token, parse_mode='HTML')
+    send_times = dict()
+    try:
+        for report_format, payload in payloads.items():
+            time_start = perf_counter()
+            if report_format == 'text':
+                await bot.send_message(chat_id, payload.decode('utf-8'))
+            else:
+                _, extension = FILE_RENDERERS[report_format]
+                await bot.send_document(chat_id, types.InputFile(
+                    io.BytesIO(payload), filename=f'report.{extension}'
+                ))
+            send_times[report_format] = perf_counter() - time_start
+    finally:
+        session = await bot.get_session()
+        await session.close()
+    return send_times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=300,
+                        help='number of rows in report')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of renders of every format')
+    parser.add_argument('--bot-token', type=str,
+                        help='token of bot to measure send time')
+    parser.add_argument('--chat-id', type=int,
+                        help='chat to send reports to')
+    args = parser.parse_args()
+
+    report = generate_departure_stations_report(args.rows)
+
+    payloads = dict()
+    render_times = dict()
+    for report_format in tuple(FILE_RENDERERS) + ('text',):
+        time_start = perf_counter()
+        for _ in range(args.repeat):
+            payloads[report_format] = render(report, report_format)
+        render_times[report_format] = (perf_counter() - time_start) / args.repeat
+
+    send_times = dict()
+    if args.bot_token and args.chat_id:
+        send_times = asyncio.run(send(args.bot_token, args.chat_id, payloads))
+
+    print(f'rows: {args.rows}')
+    print(f'{"format":<8} {"render, ms":>12} {"size, KB":>10} {"send, ms":>10}')
+    for report_format, payload in payloads.items():
+        send_time = send_times.get(report_format)
+        print(f'{report_format:<8} '
+              f'{render_times[report_format] * 1000:>12.1f} '
+              f'{len(payload) / 1024:>10.1f} '
+              f'{send_time * 1000 if send_time else float("nan"):>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,13 +1,29 @@
 import asyncio
 import logging
 
-from aiogram import Bot, Dispatcher
-from aiogram.contrib.fsm_storage.redis import RedisStorage2
+from .startup import StartupTimer
 
-from .config import setup_args_parser
-from .handlers import DepartureStationsReportHandler, \
-    DeliveryBasisReportHandler
-from .logger import setup_logger
+startup_timer = StartupTimer()
+
+with startup_timer.stage('import libraries'):
+    import aioredis
+    from aiogram import Bot, Dispatcher
+    from aiogram.contrib.fsm_storage.redis import RedisStorage2
+
+with startup_timer.stage('import bot'):
+    from scrapers import StationDirectory, TradeResultsCache
+    from scrapers.calculator_scraper import CalculatorScraper
+    from scrapers.scheduler import HostBudget, create_scheduler, set_scheduler
+    from scrapers.utils import load_scraper_config
+    from .alerts import AlertNotifier, SubscriptionStorage
+    from .background import sync_station_directory, warm_up, \
+        log_scheduler_stats, prefetch_trade_results
+    from .config import setup_args_parser
+    from .handlers import DepartureStationsReportHandler, \
+        DeliveryBasisReportHandler, ReportFormatHandler, AlertsHandler, \
+        AdminHandler
+    from .logger import setup_logger
+    from .profiling import ReportMonitor
 
 logger = logging.getLogger(__package__)
 
@@ -19,26 +35,99 @@ async def main():
     setup_logger(logger)
     setup_logger(logging.getLogger('scrapers'))
 
-    bot = Bot(args.bot_token, parse_mode='HTML')
-    storage = RedisStorage2(host=args.redis_ip, port=args.redis_port,
-                            password=args.redis_password, db=args.redis_db)
-    dp = Dispatcher(bot, storage=storage)
+    with startup_timer.stage('setup'):
+        bot = Bot(args.bot_token, parse_mode='HTML')
+        storage = RedisStorage2(host=args.redis_ip, port=args.redis_port,
+                                password=args.redis_password,
+                                db=args.redis_db)
+        dp = Dispatcher(bot, storage=storage)
+
+        scraper_config = load_scraper_config('data/scraper_config.yml')
+        # burst is equal to concurrency, so that idle host gets
+        # all its slots at once
+        set_scheduler(create_scheduler(
+            scraper_config,
+            calculator_budget=HostBudget(args.calculator_concurrency,
+                                         args.calculator_rate,
+                                         args.calculator_concurrency),
+            exchange_budget=HostBudget(args.exchange_concurrency,
+                                       args.exchange_rate,
+                                       args.exchange_concurrency)
+        ))
+        trade_results_cache = TradeResultsCache(scraper_config)
+
+        station_directory = StationDirectory('data/stations.json')
+        station_directory.load()
+
+        # one session with calculator (and its sessid) for all reports,
+        # lookups and alerts instead of a new one per request
+        calculator_scraper = CalculatorScraper(scraper_config,
+                                               station_directory)
+
+        report_monitor = ReportMonitor(bot, args.bot_admin)
+
+        departure_stations_report_handler = DepartureStationsReportHandler(
+            'data/scraper_config.yml', station_directory, trade_results_cache,
+            report_monitor=report_monitor,
+            calculator_scraper=calculator_scraper
+        )
+        departure_stations_report_handler.register(dp)
+
+        delivery_basis_report_handler = DeliveryBasisReportHandler(
+            'data/scraper_config.yml', 'data/delivery_basis_template.csv',
+            trade_results_cache, report_monitor
+        )
+        delivery_basis_report_handler.register(dp)
+
+        report_format_handler = ReportFormatHandler()
+        report_format_handler.register(dp)
+
+        redis = aioredis.Redis(host=args.redis_ip, port=args.redis_port,
+                               password=args.redis_password,
+                               db=int(args.redis_db), decode_responses=True)
+        subscription_storage = SubscriptionStorage(redis)
+        trade_results_cache.add_listener(AlertNotifier(
+            bot, subscription_storage, 'data/scraper_config.yml',
+            station_directory, calculator_scraper
+        ))
+
+        alerts_handler = AlertsHandler(subscription_storage,
+                                       station_directory, calculator_scraper)
+        alerts_handler.register(dp)
 
-    departure_stations_report_handler = DepartureStationsReportHandler(
-        'data/scraper_config.yml'
-    )
-    departure_stations_report_handler.register(dp)
+        if args.bot_admin is not None:
+            admin_handler = AdminHandler(
+                args.bot_admin, report_monitor, 'data/scraper_config.yml',
+                'data/delivery_basis_template.csv', trade_results_cache,
+                station_directory, calculator_scraper
+            )
+            admin_handler.register(dp)
+    startup_timer.log()
 
-    delivery_basis_report_handler = DeliveryBasisReportHandler(
-        'data/scraper_config.yml', 'data/delivery_basis_template.csv'
-    )
-    delivery_basis_report_handler.register(dp)
+    background_tasks = [
+        asyncio.create_task(
+            sync_station_directory(station_directory,
+                                   'data/scraper_config.yml')
+        ),
+        asyncio.create_task(log_scheduler_stats()),
+        asyncio.create_task(prefetch_trade_results(trade_results_cache))
+    ]
+    if args.bot_warm_up:
+        background_tasks.append(
+            asyncio.create_task(warm_up(trade_results_cache,
+                                      calculator_scraper))
+        )
 
     logger.info('starting bot')
     try:
         await dp.start_polling()
     finally:
         logger.info('stopping bot')
+        for task in background_tasks:
+            task.cancel()
+        await calculator_scraper.close()
+        await trade_results_cache.close()
+        await redis.close()
         await dp.storage.close()
         await dp.storage.wait_closed()
         session = await dp.bot.get_session()
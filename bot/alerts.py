@@ -0,0 +1,318 @@
+import asyncio
+import html
+import json
+import logging
+import uuid
+from dataclasses import dataclass, asdict, fields
+from typing import Optional, TYPE_CHECKING
+
+import aiohttp
+import aioredis
+from aiogram import Bot
+from aiogram.utils.exceptions import TelegramAPIError
+
+from scrapers import StationDirectory, Station, Priority, request_context
+from scrapers.calculator_scraper import CalculatorScraper
+from scrapers.errors import ApiResponseError, HtmlParsingError, \
+    InvalidStationError, InvalidFuelError
+from scrapers.utils import load_scraper_config, get_calculator_station_name, \
+    get_fuel_name
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CODE_COLUMN = 'Код Инструмента'
+BASIS_COLUMN = 'Базис поставки'
+PRICE_COLUMN = 'Цена (за единицу измерения), руб - Средневзвешенная'
+
+# max number of matches listed in one notification
+MAX_NOTIFICATION_LINES = 30
+
+
+@dataclass
+class Subscription:
+    """
+    :param target: instrument code or delivery basis
+    :param threshold: notify when price (or price + 1.1 * tariff,
+    if arrival station is set) is not greater than threshold
+    :param arrival_station: name of arrival station as in calculator
+    :param arrival_station_code: code of arrival station, None if
+    the station was accepted as typed
+    """
+
+    id: str
+    chat_id: int
+    target: str
+    threshold: float
+    arrival_station: Optional[str] = None
+    arrival_station_code: Optional[str] = None
+
+    @classmethod
+    def new(cls, chat_id: int, target: str, threshold: float,
+            arrival_station: Optional[str] = None,
+            arrival_station_code: Optional[str] = None) -> 'Subscription':
+        return cls(id=uuid.uuid4().hex[:8], chat_id=chat_id, target=target,
+                   threshold=threshold, arrival_station=arrival_station,
+                   arrival_station_code=arrival_station_code)
+
+
+class SubscriptionStorage:
+    """
+    Stores subscriptions in redis hash (id -> json) with a set
+    of subscription ids per chat
+    """
+
+    def __init__(self, redis: aioredis.Redis, prefix: str = 'fpb:alerts'):
+        self._redis = redis
+        self._prefix = prefix
+
+    def _chat_key(self, chat_id: int) -> str:
+        return f'{self._prefix}:chat:{chat_id}'
+
+    async def is_evaluated(self, snapshot_id: str) -> bool:
+        """
+        :return: whether subscriptions were evaluated against the snapshot
+        of trade results (see :meth:`mark_evaluated`)
+        """
+
+        last_snapshot_id = await self._redis.get(
+            f'{self._prefix}:last_snapshot'
+        )
+        return last_snapshot_id == snapshot_id
+
+    async def mark_evaluated(self, snapshot_id: str):
+        """
+        Remembers that notifications for the snapshot of trade results
+        were sent
+        """
+
+        await self._redis.set(f'{self._prefix}:last_snapshot', snapshot_id)
+
+    async def add(self, subscription: Subscription):
+        await self._redis.hset(self._prefix, subscription.id,
+                               json.dumps(asdict(subscription)))
+        await self._redis.sadd(self._chat_key(subscription.chat_id),
+                               subscription.id)
+
+    async def remove(self, chat_id: int, subscription_id: str) -> bool:
+        """
+        :return: whether the chat had the subscription
+        """
+
+        if not await self._redis.srem(self._chat_key(chat_id), subscription_id):
+            return False
+        await self._redis.hdel(self._prefix, subscription_id)
+        return True
+
+    async def get_by_chat(self, chat_id: int) -> list[Subscription]:
+        ids = await self._redis.smembers(self._chat_key(chat_id))
+        if not ids:
+            return []
+        values = await self._redis.hmget(self._prefix, *ids)
+        return [Subscription(**json.loads(v)) for v in values if v is not None]
+
+    async def get_all(self) -> list[Subscription]:
+        values = await self._redis.hvals(self._prefix)
+        return [Subscription(**json.loads(v)) for v in values]
+
+
+def find_price_matches(subscriptions: 'pd.DataFrame',
+                       instruments: 'pd.DataFrame') -> 'pd.DataFrame':
+    """
+    Joins subscriptions with instruments by instrument code and by
+    delivery basis in one pass and keeps pairs where fuel price is not
+    greater than threshold. Tariff is never negative, so for
+    subscriptions with arrival station the result is a superset
+    of actual matches
+
+    :param subscriptions: frame with columns of :class:`Subscription`
+    :return: frame with columns of :class:`Subscription` and instrument
+    code, delivery basis and price
+    """
+
+    import pandas as pd
+
+    prices = instruments.loc[instruments[PRICE_COLUMN].notna(),
+                             [CODE_COLUMN, BASIS_COLUMN, PRICE_COLUMN]]
+    prices = prices.astype({CODE_COLUMN: str, BASIS_COLUMN: str})
+
+    matches = pd.concat(
+        [
+            subscriptions.merge(prices, left_on='target',
+                                right_on=CODE_COLUMN),
+            subscriptions.merge(prices, left_on='target',
+                                right_on=BASIS_COLUMN)
+        ],
+        ignore_index=True
+    )
+    return matches.loc[matches[PRICE_COLUMN] <= matches['threshold'], :]
+
+
+class AlertNotifier:
+    """
+    Evaluates all subscriptions against new trade results and sends
+    one notification per chat. Should be added as listener
+    of :class:`TradeResultsCache`
+    """
+
+    def __init__(self, bot: Bot, subscription_storage: SubscriptionStorage,
+                 scraper_config_file_path: str,
+                 station_directory: Optional[StationDirectory] = None,
+                 calculator_scraper: Optional[CalculatorScraper] = None):
+        """
+        :param calculator_scraper: long-lived scraper shared with reports,
+        if not provided every evaluation creates its own one
+        """
+
+        self._bot = bot
+        self._subscription_storage = subscription_storage
+        self._config = load_scraper_config(scraper_config_file_path)
+        self._station_directory = station_directory
+        self._calculator_scraper = calculator_scraper
+
+    async def __call__(self, instruments: 'pd.DataFrame', snapshot_id: str):
+        try:
+            # trade results downloaded after restart may be already
+            # evaluated. The snapshot is marked only after notifications
+            # are sent, so that failed evaluation is retried after restart
+            if await self._subscription_storage.is_evaluated(snapshot_id):
+                return
+            with request_context(Priority.BACKGROUND):
+                await self._notify(instruments)
+            await self._subscription_storage.mark_evaluated(snapshot_id)
+        except Exception as err:
+            logger.exception(err)
+
+    async def _notify(self, instruments: 'pd.DataFrame'):
+        import pandas as pd
+
+        subscriptions = await self._subscription_storage.get_all()
+        if not subscriptions:
+            return
+
+        subscriptions = pd.DataFrame(
+            [asdict(s) for s in subscriptions],
+            columns=[f.name for f in fields(Subscription)]
+        )
+        matches = find_price_matches(subscriptions, instruments)
+        matches = matches.assign(total=matches[PRICE_COLUMN])
+
+        with_station = matches['arrival_station'].notna()
+        if with_station.any():
+            matches = pd.concat([
+                matches.loc[~with_station, :],
+                await self._add_tariffs(matches.loc[with_station, :])
+            ])
+        matches = matches.loc[matches['total'] <= matches['threshold'], :]
+
+        logger.info(f'alerts subscriptions={subscriptions.shape[0]} '
+                    f'matches={matches.shape[0]} '
+                    f'chats={matches["chat_id"].nunique()}')
+
+        for chat_id, chat_matches in matches.groupby('chat_id'):
+            try:
+                await self._bot.send_message(
+                    int(chat_id), self._format_notification(chat_matches)
+                )
+            except TelegramAPIError as err:
+                logger.warning(f'failed to notify chat={chat_id}: {err}')
+            # stay within telegram limit of messages per second
+            await asyncio.sleep(0.05)
+
+    async def _add_tariffs(self, matches: 'pd.DataFrame') -> 'pd.DataFrame':
+        """
+        Sets total cost (price + 1.1 * tariff) of matches, requesting
+        the tariff once per unique route. Matches without tariff
+        are dropped
+        """
+
+        departure_stations = {
+            basis: get_calculator_station_name(self._config, basis)
+            for basis in matches[BASIS_COLUMN].unique()
+        }
+        calculator_fuels = {
+            code: self._config.FUEL_NAME_TO_CALCULATOR_ITEM.get(
+                get_fuel_name(self._config, code)
+            )
+            for code in matches[CODE_COLUMN].unique()
+        }
+        matches = matches.assign(
+            departure_station=matches[BASIS_COLUMN].map(departure_stations),
+            calculator_fuel=matches[CODE_COLUMN].map(calculator_fuels),
+            # subscriptions created before codes were stored have no code
+            arrival_station_code=matches['arrival_station_code'].fillna('')
+        ).dropna(subset=['departure_station', 'calculator_fuel'])
+
+        route_columns = ['departure_station', 'arrival_station',
+                         'arrival_station_code', 'calculator_fuel']
+        routes = list(matches[route_columns].drop_duplicates()
+                      .itertuples(index=False, name=None))
+
+        calculator_scraper = self._calculator_scraper \
+            or CalculatorScraper(self._config, self._station_directory)
+        try:
+            # one failed route must not stop notifications of other chats
+            tariffs = await asyncio.gather(*(
+                self._get_tariff(calculator_scraper, *route)
+                for route in routes
+            ), return_exceptions=True)
+        finally:
+            if calculator_scraper is not self._calculator_scraper:
+                await calculator_scraper.close()
+
+        for route, tariff in zip(routes, tariffs):
+            if isinstance(tariff, Exception):
+                logger.error(f'failed to get tariff {route}: {tariff!r}')
+        tariffs = {
+            route: None if isinstance(tariff, Exception) else tariff
+            for route, tariff in zip(routes, tariffs)
+        }
+        matches = matches.assign(tariff=[
+            tariffs[route] for route in
+            matches[route_columns].itertuples(index=False, name=None)
+        ]).dropna(subset=['tariff'])
+        return matches.assign(
+            total=matches[PRICE_COLUMN] + matches['tariff'] * 1.1
+        )
+
+    async def _get_tariff(self, calculator_scraper: CalculatorScraper,
+                          departure_station: str, arrival_station: str,
+                          arrival_station_code: str,
+                          calculator_fuel: str) -> Optional[float]:
+        try:
+            rzd_price_info = await calculator_scraper.get_rzd_price_info(
+                st1=departure_station,
+                st2=Station(code=arrival_station_code, name=arrival_station)
+                if arrival_station_code else arrival_station,
+                fuel=calculator_fuel,
+                weight=self._config.CALCULATOR_ITEM_WEIGHTS[calculator_fuel],
+                capacity=66
+            )
+        except (asyncio.TimeoutError, ApiResponseError, HtmlParsingError,
+                InvalidStationError, InvalidFuelError,
+                aiohttp.ClientResponseError) as err:
+            logger.warning(f'failed to get tariff {departure_station} - '
+                           f'{arrival_station}: {err!r}')
+            return None
+        return float(rzd_price_info['sumtWithVat'])
+
+    @staticmethod
+    def _format_notification(matches: 'pd.DataFrame') -> str:
+        import pandas as pd
+
+        lines = []
+        for row in matches.sort_values('total') \
+                .head(MAX_NOTIFICATION_LINES).to_dict('records'):
+            line = f'{row["target"]}: {row[CODE_COLUMN]} ' \
+                   f'{row[BASIS_COLUMN]} - {row[PRICE_COLUMN]:.2f}'
+            if pd.notna(row['arrival_station']):
+                line += f' (с доставкой до {row["arrival_station"]}: ' \
+                        f'{row["total"]:.2f})'
+            lines.append(html.escape(f'{line} ≤ {row["threshold"]:.2f}'))
+
+        text = 'Цены достигли порога:\n' + '\n'.join(lines)
+        if matches.shape[0] > MAX_NOTIFICATION_LINES:
+            text += f'\n... и ещё {matches.shape[0] - MAX_NOTIFICATION_LINES}'
+        return text
@@ -0,0 +1,120 @@
+import asyncio
+import importlib
+import logging
+from time import monotonic
+from typing import Optional
+
+import aiohttp
+
+from scrapers import StationDirectory, TradeResultsCache, Priority, \
+    request_context
+from scrapers.calculator_scraper import CalculatorScraper
+from scrapers.errors import ApiResponseError, HtmlParsingError
+from scrapers.scheduler import get_scheduler
+from scrapers.utils import load_scraper_config
+from .startup import HEAVY_MODULES
+
+logger = logging.getLogger(__name__)
+
+WARM_UP_MODULES = HEAVY_MODULES + ('scrapers.delivery_basis_reporter',
+                                   'scrapers.departure_stations_reporter')
+
+
+async def sync_station_directory(station_directory: StationDirectory,
+                                 scraper_config_file_path: str,
+                                 interval: float = 24 * 60 * 60):
+    """
+    Periodically syncs station directory with calculator API.
+    Should be run as a background task
+    """
+
+    config = load_scraper_config(scraper_config_file_path)
+    while True:
+        calculator_scraper = CalculatorScraper(config)
+        try:
+            with request_context(Priority.BACKGROUND):
+                await station_directory.sync(calculator_scraper)
+        except asyncio.TimeoutError as err:
+            logger.exception(err)
+        except (ApiResponseError, HtmlParsingError,
+                aiohttp.ClientResponseError) as err:
+            logger.exception(err)
+        finally:
+            await calculator_scraper.close()
+        await asyncio.sleep(interval)
+
+
+async def warm_up(trade_results_cache: TradeResultsCache,
+                  calculator_scraper: Optional[CalculatorScraper] = None):
+    """
+    Pre-loads heavy report dependencies, downloads trade results and
+    opens connection to calculator (with sessid), so that the first report
+    doesn't pay for them.
+    Should be run as a background task after polling starts
+    """
+
+    time_start = monotonic()
+    loop = asyncio.get_running_loop()
+    for module_name in WARM_UP_MODULES:
+        await loop.run_in_executor(None, importlib.import_module, module_name)
+    logger.info(f'warm-up modules loaded '
+                f'time={round((monotonic() - time_start) * 1000, 3)}ms')
+
+    try:
+        with request_context(Priority.BACKGROUND):
+            await trade_results_cache.get_all_instruments()
+    except asyncio.TimeoutError as err:
+        logger.exception(err)
+    except (HtmlParsingError, aiohttp.ClientResponseError) as err:
+        logger.exception(err)
+
+    if calculator_scraper is not None:
+        try:
+            with request_context(Priority.BACKGROUND):
+                await calculator_scraper.warm_up()
+        except asyncio.TimeoutError as err:
+            logger.exception(err)
+        except (HtmlParsingError, aiohttp.ClientResponseError) as err:
+            logger.exception(err)
+    logger.info(f'warm-up finished '
+                f'time={round((monotonic() - time_start) * 1000, 3)}ms')
+
+
+async def log_scheduler_stats(interval: float = 10 * 60):
+    """
+    Periodically logs queue wait time of upstream requests.
+    Should be run as a background task
+    """
+
+    while True:
+        await asyncio.sleep(interval)
+        stats = get_scheduler().get_queue_wait_stats()
+        for (host, priority), host_stats in stats.items():
+            logger.info(f'scheduler host={host} priority={priority.name} '
+                        f'requests={host_stats.count} '
+                        f'mean_wait={round(host_stats.mean_time * 1000, 3)}ms '
+                        f'max_wait={round(host_stats.max_time * 1000, 3)}ms')
+
+
+async def prefetch_trade_results(trade_results_cache: TradeResultsCache,
+                                 interval: float = 15 * 60,
+                                 initial_delay: float = 60):
+    """
+    Periodically checks for new trade results, so that listeners
+    of the cache (e.g. alerts) are notified without user requests.
+    Should be run as a background task
+
+    :param initial_delay: delay before the first check, so that
+    it doesn't slow down bot startup
+    """
+
+    await asyncio.sleep(initial_delay)
+    while True:
+        try:
+            with request_context(Priority.BACKGROUND):
+                await trade_results_cache.refresh()
+        except asyncio.TimeoutError as err:
+            logger.exception(err)
+        except (HtmlParsingError, aiohttp.ClientResponseError) as err:
+            logger.exception(err)
+        await asyncio.sleep(interval)
@@ -23,6 +23,33 @@ def setup_args_parser() -> ArgumentParser:
     bot_group.add_argument('--bot-admin',
                            type=int,
                            help='ID of bot admin')
+    bot_group.add_argument('--bot-warm-up',
+                           action='store_true',
+                           help='Pre-load report dependencies, trade '
+                                'results and calculator session '
+                                'in background after start')
+
+    upstream_group = parser.add_argument_group('upstream')
+    upstream_group.add_argument('--calculator-concurrency',
+                                type=int,
+                                default=4,
+                                help='Max number of simultaneous requests '
+                                     'to calculator')
+    upstream_group.add_argument('--calculator-rate',
+                                type=float,
+                                default=5,
+                                help='Max number of requests per second '
+                                     'to calculator')
+    upstream_group.add_argument('--exchange-concurrency',
+                                type=int,
+                                default=2,
+                                help='Max number of simultaneous requests '
+                                     'to exchange')
+    upstream_group.add_argument('--exchange-rate',
+                                type=float,
+                                default=2,
+                                help='Max number of requests per second '
+                                     'to exchange')
 
     redis_group = parser.add_argument_group('redis')
     redis_group.add_argument('--redis-ip',
@@ -1,4 +1,8 @@
+from .admin_handler import AdminHandler
+from .alerts_handler import AlertsHandler
 from .delivery_basis_report_handler import DeliveryBasisReportHandler
 from .departure_stations_report_handler import DepartureStationsReportHandler
+from .report_format_handler import ReportFormatHandler
 
-__all__ = ('DeliveryBasisReportHandler', 'DepartureStationsReportHandler')
+__all__ = ('AdminHandler', 'AlertsHandler', 'DeliveryBasisReportHandler',
+           'DepartureStationsReportHandler', 'ReportFormatHandler')
@@ -0,0 +1,133 @@
+import html
+import logging
+from typing import Optional
+
+from aiogram import types, Dispatcher
+
+from scrapers import StationDirectory, TradeResultsCache, \
+    Priority, request_context
+from scrapers.calculator_scraper import CalculatorScraper
+from ..profiling import ReportMonitor
+
+logger = logging.getLogger(__name__)
+
+
+class AdminHandler:
+    """
+    Admin-only commands to diagnose slow reports. Should be registered
+    only when admin is set
+    """
+
+    def __init__(self, admin_id: int, report_monitor: ReportMonitor,
+                 scraper_config_file_path: str, template_file_path: str,
+                 trade_results_cache: Optional[TradeResultsCache] = None,
+                 station_directory: Optional[StationDirectory] = None,
+                 calculator_scraper: Optional[CalculatorScraper] = None):
+        self._admin_id = admin_id
+        self._report_monitor = report_monitor
+        self._scraper_config_file_path = scraper_config_file_path
+        self._template_file_path = template_file_path
+        self._trade_results_cache = trade_results_cache
+        self._station_directory = station_directory
+        self._calculator_scraper = calculator_scraper
+
+    async def profile_next_handler(self, message: types.Message):
+        logger.info(f'user={message.from_user.id} command={message.text}')
+
+        self._report_monitor.profile_next()
+        await message.answer('Следующий отчёт будет запущен под профилировщиком')
+
+    async def profile_handler(self, message: types.Message):
+        logger.info(f'user={message.from_user.id} command={message.text}')
+
+        # /profile delivery_basis_report
+        # /profile departure_stations_report <fuel>; <arrival station>
+        report_name, _, args = message.get_args().strip().partition(' ')
+        args = [arg.strip() for arg in args.split(';')]
+        if report_name == 'delivery_basis_report':
+            await self._profile_delivery_basis_report(message)
+        elif report_name == 'departure_stations_report' and len(args) == 2:
+            await self._profile_departure_stations_report(message, *args)
+        else:
+            await message.answer(
+                'Использование:\n'
+                '/profile delivery_basis_report\n'
+                '/profile departure_stations_report топливо; станция прибытия'
+            )
+
+    async def _profile_delivery_basis_report(self, message: types.Message):
+        from scrapers import DeliveryBasisReporter
+
+        reporter = DeliveryBasisReporter(
+            self._template_file_path, self._scraper_config_file_path,
+            self._trade_results_cache
+        )
+        try:
+            async with self._report_monitor.run('delivery_basis_report',
+                                                message.chat.id,
+                                                profile=True) as run:
+                try:
+                    with request_context(Priority.INTERACTIVE,
+                                         message.chat.id):
+                        await reporter.get_report()
+                finally:
+                    run.add_stage_times(reporter.stage_times)
+        except Exception as err:
+            logger.exception(err)
+            await message.answer(f'Отчёт завершился ошибкой: '
+                                 f'{html.escape(repr(err))}')
+        finally:
+            await reporter.close()
+
+    async def _profile_departure_stations_report(self, message: types.Message,
+                                                 fuel_name: str,
+                                                 arrival_station: str):
+        from scrapers import DepartureStationsReporter
+
+        reporter = DepartureStationsReporter(
+            self._scraper_config_file_path, self._station_directory,
+            trade_results_cache=self._trade_results_cache,
+            calculator_scraper=self._calculator_scraper
+        )
+        try:
+            async with self._report_monitor.run('departure_stations_report',
+                                                message.chat.id,
+                                                profile=True) as run:
+                try:
+                    with request_context(Priority.INTERACTIVE,
+                                         message.chat.id):
+                        await reporter.get_report(arrival_station, fuel_name)
+                finally:
+                    run.add_stage_times(reporter.stage_times)
+                    run.add_task_timings(reporter.task_timings)
+        except Exception as err:
+            logger.exception(err)
+            await message.answer(f'Отчёт завершился ошибкой: '
+                                 f'{html.escape(repr(err))}')
+        finally:
+            await reporter.close()
+
+    async def slow_reports_handler(self, message: types.Message):
+        logger.info(f'user={message.from_user.id} command={message.text}')
+
+        slow_reports = self._report_monitor.slow_reports
+        if not slow_reports:
+            await message.answer('Медленных отчётов нет')
+            return
+
+        # the latest reports are the most relevant, message length
+        # is limited by telegram
+        lines = [report_run.format() for report_run in reversed(slow_reports)]
+        text = '\n'.join(lines)[:4000]
+        await message.answer(f'<pre>{html.escape(text)}</pre>')
+
+    def register(self, dp: Dispatcher):
+        dp.register_message_handler(self.profile_next_handler,
+                                    commands=['profile_next'],
+                                    user_id=self._admin_id)
+        dp.register_message_handler(self.profile_handler,
+                                    commands=['profile'],
+                                    user_id=self._admin_id)
+        dp.register_message_handler(self.slow_reports_handler,
+                                    commands=['slow_reports'],
+                                    user_id=self._admin_id)
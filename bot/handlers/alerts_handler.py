@@ -0,0 +1,138 @@
+import html
+import logging
+import math
+from typing import Optional
+
+from aiogram import types, Dispatcher
+
+from scrapers import StationDirectory
+from scrapers.calculator_scraper import CalculatorScraper
+from ..alerts import Subscription, SubscriptionStorage
+from ..stations import lookup_station
+
+logger = logging.getLogger(__name__)
+
+
+class AlertsHandler:
+    """
+    Manages price alert subscriptions of the chat
+    """
+
+    def __init__(self, subscription_storage: SubscriptionStorage,
+                 station_directory: Optional[StationDirectory] = None,
+                 calculator_scraper: Optional[CalculatorScraper] = None,
+                 max_subscriptions: int = 50):
+        """
+        :param station_directory: with calculator scraper, used to
+        validate arrival stations, otherwise they are accepted as typed
+        """
+
+        self._subscription_storage = subscription_storage
+        self._station_directory = station_directory
+        self._calculator_scraper = calculator_scraper
+        self._max_subscriptions = max_subscriptions
+
+    async def subscribe_handler(self, message: types.Message):
+        logger.info(f'user={message.from_user.id} command={message.text}')
+
+        # /subscribe <code or basis>; <threshold>[; <arrival station>]
+        args = [arg.strip() for arg in message.get_args().split(';')]
+        if len(args) not in (2, 3) or not args[0]:
+            await message.answer(
+                'Использование: /subscribe код инструмента или базис; '
+                'порог цены[; станция прибытия]\n'
+                'Например: /subscribe ст. Сургут; 50000; Комбинатская'
+            )
+            return
+
+        try:
+            threshold = float(args[1].replace(',', '.'))
+        except ValueError:
+            threshold = None
+        # float() also accepts nan, inf and negative numbers
+        if threshold is None or not math.isfinite(threshold) \
+                or threshold <= 0:
+            await message.answer(f'{html.escape(args[1])} - невалидный порог, '
+                                 f'ожидается положительное число')
+            return
+
+        arrival_station = args[2] if len(args) == 3 and args[2] else None
+        arrival_station_code = None
+        if arrival_station is not None \
+                and self._station_directory is not None \
+                and self._calculator_scraper is not None:
+            station, suggestions = await lookup_station(
+                self._station_directory, self._calculator_scraper,
+                arrival_station, message.chat.id
+            )
+            if station is not None:
+                # the code is kept, as the name may be shared
+                # by other stations
+                arrival_station = station.name
+                arrival_station_code = station.code
+            elif suggestions is not None:
+                text = f'Станция {html.escape(arrival_station)} не найдена'
+                if suggestions:
+                    text += '. Возможно, вы имели в виду (можно указать ' \
+                            'код станции):\n' + '\n'.join(
+                                f'<code>{s.code}</code> {html.escape(s.name)}'
+                                for s in suggestions
+                            )
+                await message.answer(text)
+                return
+
+        subscriptions = await self._subscription_storage.get_by_chat(
+            message.chat.id
+        )
+        if len(subscriptions) >= self._max_subscriptions:
+            await message.answer(f'Нельзя создать больше '
+                                 f'{self._max_subscriptions} подписок')
+            return
+
+        subscription = Subscription.new(message.chat.id, args[0], threshold,
+                                        arrival_station, arrival_station_code)
+        await self._subscription_storage.add(subscription)
+        await message.answer(f'Подписка создана: '
+                             f'{self._format_subscription(subscription)}')
+
+    async def subscriptions_handler(self, message: types.Message):
+        logger.info(f'user={message.from_user.id} command={message.text}')
+
+        subscriptions = await self._subscription_storage.get_by_chat(
+            message.chat.id
+        )
+        if not subscriptions:
+            await message.answer('У вас нет подписок')
+            return
+
+        await message.answer('\n'.join(
+            self._format_subscription(s) for s in subscriptions
+        ))
+
+    async def unsubscribe_handler(self, message: types.Message):
+        logger.info(f'user={message.from_user.id} command={message.text}')
+
+        subscription_id = message.get_args().strip()
+        if await self._subscription_storage.remove(message.chat.id,
+                                                   subscription_id):
+            await message.answer('Подписка удалена')
+        else:
+            await message.answer('Использование: /unsubscribe id подписки '
+                                 '(см. /subscriptions)')
+
+    @staticmethod
+    def _format_subscription(subscription: Subscription) -> str:
+        text = f'<code>{subscription.id}</code> ' \
+               f'{html.escape(subscription.target)} ≤ {subscription.threshold:.2f}'
+        if subscription.arrival_station is not None:
+            text += f' (с доставкой до ' \
+                    f'{html.escape(subscription.arrival_station)})'
+        return text
+
+    def register(self, dp: Dispatcher):
+        dp.register_message_handler(self.subscribe_handler,
+                                    commands=['subscribe'])
+        dp.register_message_handler(self.subscriptions_handler,
+                                    commands=['subscriptions'])
+        dp.register_message_handler(self.unsubscribe_handler,
+                                    commands=['unsubscribe'])
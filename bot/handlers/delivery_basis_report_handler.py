@@ -1,32 +1,56 @@
 import asyncio
 import logging
-import os
-import uuid
+from typing import Optional
 
 import aiohttp
 from aiogram import Dispatcher
 from aiogram import types
 
-from scrapers import DeliveryBasisReporter
+from scrapers import TradeResultsCache, Priority, request_context
 from scrapers.errors import ApiResponseError, HtmlParsingError
-from ..utils import save_as_xl
+from .report_format_handler import get_report_format, send_report
+from ..profiling import ReportMonitor
+from ..renderers import REPORT_FORMATS
 
 logger = logging.getLogger(__name__)
 
 
 class DeliveryBasisReportHandler:
-    def __init__(self, scraper_config_file_path: str, template_file_path: str):
+    def __init__(self, scraper_config_file_path: str, template_file_path: str,
+                 trade_results_cache: Optional[TradeResultsCache] = None,
+                 report_monitor: Optional[ReportMonitor] = None):
         self._scraper_config_file_path = scraper_config_file_path
         self._template_file_path = template_file_path
+        self._trade_results_cache = trade_results_cache
+        self._report_monitor = report_monitor or ReportMonitor()
 
     async def handler(self, message: types.Message):
         logger.info(f'user={message.from_user.id} command={message.text}')
 
+        # /delivery_basis_report [format] overrides saved format
+        report_format = message.get_args()
+        if report_format not in REPORT_FORMATS:
+            report_format = await get_report_format(message.chat.id)
+
+        # imported lazily to keep pandas out of bot startup
+        from scrapers import DeliveryBasisReporter
+
         reporter = DeliveryBasisReporter(
-            self._template_file_path, self._scraper_config_file_path
+            self._template_file_path, self._scraper_config_file_path,
+            self._trade_results_cache
         )
         try:
-            report = await reporter.get_report()
+            async with self._report_monitor.run('delivery_basis_report',
+                                                message.chat.id) as run:
+                try:
+                    with request_context(Priority.INTERACTIVE,
+                                         message.chat.id):
+                        report = await reporter.get_report()
+                finally:
+                    run.add_stage_times(reporter.stage_times)
+                with run.stage('send'):
+                    await send_report(message, report, report_format,
+                                      'delivery_basis_report')
         except asyncio.TimeoutError as err:
             logger.exception(err)
             await message.answer('сайт не отвечает(')
@@ -36,14 +60,6 @@ class DeliveryBasisReportHandler:
         except Exception as err:
             logger.exception(err)
             await message.answer('Извините, что-то совсем пошло не так(')
-        else:
-            file_name = uuid.uuid4()
-            file_path = f'/tmp/{file_name}.xlsx'
-            save_as_xl(report, file_path)
-            with open(file_path, 'rb') as file:
-                await message.answer_document(file)
-            if os.path.isfile(file_path):
-                os.remove(file_path)
         finally:
             await reporter.close()
 
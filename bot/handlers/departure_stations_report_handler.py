@@ -1,7 +1,9 @@
 import asyncio
+import html
 import logging
-import os
-import uuid
+from time import monotonic
+from collections import Counter
+from typing import Optional, Union, TYPE_CHECKING
 
 import aiohttp
 from aiogram import types, Dispatcher
@@ -9,11 +11,22 @@ from aiogram.dispatcher import FSMContext
 from aiogram.dispatcher.filters.state import State, StatesGroup
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.callback_data import CallbackData
+from aiogram.utils.exceptions import TelegramAPIError
 
-from scrapers import DepartureStationsReporter
+from scrapers import StationDirectory, Station, TradeResultsCache, \
+    Priority, request_context
+from scrapers.calculator_scraper import CalculatorScraper
 from scrapers.errors import HtmlParsingError, ApiResponseError, \
     InvalidStationError, InvalidFuelError
-from ..utils import save_as_xl
+from scrapers.utils import load_scraper_config
+from .report_format_handler import get_report_format, send_report
+from ..profiling import ReportMonitor
+from ..stations import lookup_station
+from ..renderers import REPORT_FORMATS, DEFAULT_REPORT_FORMAT, \
+    DEPARTURE_STATIONS_TEXT_COLUMNS, render_text
+
+if TYPE_CHECKING:
+    from scrapers import DepartureStationsReporter, ReportProgress
 
 logger = logging.getLogger(__name__)
 
@@ -24,9 +37,27 @@ class States(StatesGroup):
 
 
 class DepartureStationsReportHandler:
-    def __init__(self, scraper_config_file_path: str):
+    def __init__(self, scraper_config_file_path: str,
+                 station_directory: StationDirectory,
+                 trade_results_cache: Optional[TradeResultsCache] = None,
+                 progress_interval: float = 3, default_top_k: int = 5,
+                 report_monitor: Optional[ReportMonitor] = None,
+                 calculator_scraper: Optional[CalculatorScraper] = None):
+        """
+        :param calculator_scraper: long-lived scraper shared between
+        reports, if not provided every report creates its own one
+        """
+
         self._scraper_config_file_path = scraper_config_file_path
+        self._scraper_config = load_scraper_config(scraper_config_file_path)
+        self._station_directory = station_directory
+        self._trade_results_cache = trade_results_cache
+        self._report_monitor = report_monitor or ReportMonitor()
+        self._calculator_scraper = calculator_scraper
+        self._progress_interval = progress_interval
+        self._default_top_k = default_top_k
         self._callback_data_factory = CallbackData('f', 'fuel_name')
+        self._station_callback_data_factory = CallbackData('s', 'code')
         self._fuel_names = ('АИ-92-К5', 'АИ-95-К5',
                             'ДТ-А-К5', 'ДТ-Е-К5', 'ДТ-З-К5',
                             'ДТ-Л-К5', 'МАЗУТ', 'ТС-1')
@@ -45,13 +76,52 @@ class DepartureStationsReportHandler:
 
         return keyboard
 
+    def _create_stations_keyboard(self, stations: list[Station]) \
+            -> InlineKeyboardMarkup:
+        keyboard = InlineKeyboardMarkup(row_width=1)
+
+        # stations with equal names are told apart by code
+        name_counts = Counter(station.name for station in stations)
+        for station in stations:
+            text = station.name
+            if name_counts[station.name] > 1:
+                text += f' ({station.code})'
+            button = InlineKeyboardButton(
+                text=text,
+                callback_data=self._station_callback_data_factory.new(
+                    code=station.code
+                )
+            )
+            keyboard.insert(button)
+
+        return keyboard
+
     def fuel_step_filter(self):
         return self._callback_data_factory.filter()
 
+    def station_step_filter(self):
+        return self._station_callback_data_factory.filter()
+
     async def start_handler(self, message: types.Message, state: FSMContext):
+        # /cheapest_departure_stations [N] [format] reports only
+        # N cheapest stations, format overrides saved format
+        top_k = None
+        if message.get_command(pure=True) == 'cheapest_departure_stations':
+            top_k = self._default_top_k
+        report_format = None
+        for arg in message.get_args().split():
+            if arg in REPORT_FORMATS:
+                report_format = arg
+            elif top_k is not None and arg.isdigit() and int(arg) > 0:
+                top_k = int(arg)
+        if report_format is None:
+            report_format = await get_report_format(message.chat.id)
+
         await message.answer('Выберите топливо:',
                              reply_markup=self._create_fuel_keyboard())
         await state.set_state(States.entering_fuel)
+        await state.update_data({'top_k': top_k,
+                                 'report_format': report_format})
 
         logger.info(f'user={message.from_user.id} command={message.text}')
 
@@ -63,7 +133,7 @@ class DepartureStationsReportHandler:
 
         await callback.answer(text=f"Вы выбрали {fuel_name}")
         await callback.message.edit_reply_markup()
-        await callback.message.edit_text(f"Топливо: <b>{fuel_name}</b>")
+        await callback.message.edit_text(f"Топливо: <b>{html.escape(fuel_name)}</b>")
 
         await state.update_data({'fuel_name': fuel_name})
 
@@ -75,42 +145,190 @@ class DepartureStationsReportHandler:
         arrival_station = message.text
         logger.info(f'user={message.from_user.id} message={arrival_station}')
 
-        fuel_name = (await state.get_data())['fuel_name']
-        reporter = DepartureStationsReporter(self._scraper_config_file_path)
+        station, suggestions = await self._lookup_station(arrival_station,
+                                                          message.chat.id)
+        if station is not None:
+            # the station (not its name) is passed, as the name
+            # may be shared by other stations
+            arrival_station = station
+        elif suggestions is not None:
+            if suggestions:
+                await message.answer(
+                    'Станция не найдена. Возможно, вы имели в виду:',
+                    reply_markup=self._create_stations_keyboard(suggestions)
+                )
+            else:
+                await message.answer('Станция не найдена. '
+                                     'Введите станцию прибытия:')
+            return
+
+        await self._send_report(message, state, arrival_station)
+
+    async def _lookup_station(self, arrival_station: str, chat_id: int) \
+            -> tuple[Optional[Station], Optional[list[Station]]]:
+        """
+        :return: the station and suggestions as in :func:`lookup_station`
+        """
+
+        station = self._station_directory.get(arrival_station)
+        if station is not None:
+            return station, []
+
+        calculator_scraper = self._calculator_scraper \
+            or CalculatorScraper(self._scraper_config, self._station_directory)
+        try:
+            return await lookup_station(self._station_directory,
+                                        calculator_scraper, arrival_station,
+                                        chat_id)
+        finally:
+            if calculator_scraper is not self._calculator_scraper:
+                await calculator_scraper.close()
+
+    async def chosen_station_handler(self, callback: types.CallbackQuery,
+                                     callback_data: dict[str, str],
+                                     state: FSMContext):
+        station = self._station_directory.get_by_code(callback_data['code'])
+        logger.info(f'user={callback.from_user.id} '
+                    f'callback_query={callback_data["code"]}')
+
+        if station is None:
+            await callback.answer()
+            await callback.message.edit_text('Введите станцию прибытия:')
+            return
+
+        await callback.answer(text=f'Вы выбрали {station.name}')
+        await callback.message.edit_reply_markup()
+        await callback.message.edit_text(f'Станция прибытия: '
+                                         f'<b>{html.escape(station.name)}</b>')
+
+        await self._send_report(callback.message, state, station)
+
+    async def _send_report(self, message: types.Message, state: FSMContext,
+                           arrival_station: Union[str, Station]):
+        data = await state.get_data()
+        fuel_name = data['fuel_name']
+        top_k = data.get('top_k')
+        report_format = data.get('report_format', DEFAULT_REPORT_FORMAT)
+
+        # imported lazily to keep pandas out of bot startup
+        from scrapers import DepartureStationsReporter
+
+        reporter = DepartureStationsReporter(
+            self._scraper_config_file_path, self._station_directory,
+            trade_results_cache=self._trade_results_cache,
+            calculator_scraper=self._calculator_scraper
+        )
+        report_name = 'departure_stations_report' if top_k is None \
+            else 'cheapest_departure_stations'
         try:
-            report = await reporter.get_report(arrival_station, fuel_name)
+            async with self._report_monitor.run(report_name,
+                                                message.chat.id) as run:
+                try:
+                    with request_context(Priority.INTERACTIVE,
+                                         message.chat.id):
+                        if top_k is not None:
+                            report = await self._get_top_report(
+                                message, reporter, arrival_station,
+                                fuel_name, top_k
+                            )
+                        else:
+                            report = await self._get_report(
+                                message, reporter, arrival_station, fuel_name
+                            )
+                finally:
+                    run.add_stage_times(reporter.stage_times)
+                    run.add_task_timings(reporter.task_timings)
+                with run.stage('send'):
+                    await send_report(message, report, report_format,
+                                      'departure_stations_report',
+                                      DEPARTURE_STATIONS_TEXT_COLUMNS)
         except asyncio.TimeoutError as err:
             logger.exception(err)
             await message.answer('сайт не отвечает(')
         except InvalidStationError as err:
             logger.exception(err)
-            await message.answer(f'Во время обработки встретилась невалидная станция: {err.station}')
+            await message.answer(f'Во время обработки встретилась невалидная станция: {html.escape(err.station)}')
         except InvalidFuelError as err:
             logger.exception(err)
-            await message.answer(f'{err.fuel} - невалидное топливо')
+            await message.answer(f'{html.escape(err.fuel)} - невалидное топливо')
         except (ApiResponseError, HtmlParsingError, aiohttp.ClientResponseError) as err:
             logger.exception(err)
             await message.answer('Извините, что-то пошло не так(')
         except Exception as err:
             logger.exception(err)
             await message.answer('Извините, что-то совсем пошло не так(')
-        else:
-            file_name = uuid.uuid4()
-            file_path = f"/tmp/{file_name}.xlsx"
-            save_as_xl(report, file_path)
-            with open(file_path, 'rb') as file:
-                await message.answer_document(file)
-            if os.path.isfile(file_path):
-                os.remove(file_path)
         finally:
             await reporter.close()
             await state.finish()
 
+    async def _get_report(self, message: types.Message,
+                          reporter: 'DepartureStationsReporter',
+                          arrival_station: Union[str, Station],
+                          fuel_name: str):
+        """
+        Builds the report keeping a message with progress and the cheapest
+        stations so far up to date
+        """
+
+        progress_message = await message.answer('Считаю тарифы...')
+        last_edit_time = monotonic()
+
+        report = None
+        async for progress in reporter.iter_report(arrival_station, fuel_name):
+            report = progress.report
+            if monotonic() - last_edit_time < self._progress_interval \
+                    and progress.done < progress.total:
+                continue
+            try:
+                await progress_message.edit_text(
+                    self._format_progress(progress)
+                )
+            except TelegramAPIError as err:
+                logger.warning(f'failed to update progress: {err}')
+            last_edit_time = monotonic()
+
+        return reporter.sort_report(report)
+
+    @staticmethod
+    async def _get_top_report(message: types.Message,
+                              reporter: 'DepartureStationsReporter',
+                              arrival_station: Union[str, Station],
+                              fuel_name: str,
+                              top_k: int):
+        await message.answer(f'Ищу {top_k} самых дешёвых станций...')
+        top_report = await reporter.get_top_report(arrival_station,
+                                                   fuel_name, top_k)
+        logger.info(f'top report k={top_k} '
+                    f'tariffs={top_report.num_tariffs} '
+                    f'saved={top_report.num_tariffs_saved}')
+        await message.answer(
+            f'Запрошено тарифов: {top_report.num_tariffs}, '
+            f'сэкономлено запросов: {top_report.num_tariffs_saved}'
+        )
+        return top_report.report
+
+    @staticmethod
+    def _format_progress(progress: 'ReportProgress', top_n: int = 10) -> str:
+        report = progress.report
+        report = report.loc[report['Итого'].notna(), :]
+        report = report.nsmallest(top_n, 'Итого')
+
+        text = f'Посчитано тарифов: {progress.done}/{progress.total}'
+        if report.shape[0] > 0:
+            text += '\n\nСамые дешёвые станции:\n' + render_text(
+                report, top_n, DEPARTURE_STATIONS_TEXT_COLUMNS
+            )
+        return text
+
     def register(self, dp: Dispatcher):
         dp.register_message_handler(self.start_handler,
-                                    commands=['departure_stations_report'])
+                                    commands=['departure_stations_report',
+                                              'cheapest_departure_stations'])
         dp.register_callback_query_handler(self.entered_fuel_handler,
                                            self.fuel_step_filter(),
                                            state=States.entering_fuel)
         dp.register_message_handler(self.entered_station_handler,
                                     state=States.entering_station)
+        dp.register_callback_query_handler(self.chosen_station_handler,
+                                           self.station_step_filter(),
+                                           state=States.entering_station)
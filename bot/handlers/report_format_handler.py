@@ -0,0 +1,116 @@
+import io
+import logging
+from typing import Optional, TYPE_CHECKING
+
+from aiogram import types, Dispatcher
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.utils.callback_data import CallbackData
+
+from ..renderers import FILE_RENDERERS, REPORT_FORMATS, \
+    DEFAULT_REPORT_FORMAT, render_text
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+async def get_report_format(chat_id: int) -> str:
+    """
+    :return: report format saved by the chat with /report_format
+    """
+
+    storage = Dispatcher.get_current().storage
+    bucket = await storage.get_bucket(chat=chat_id)
+    return bucket.get('report_format', DEFAULT_REPORT_FORMAT)
+
+
+async def set_report_format(chat_id: int, report_format: str):
+    if report_format not in REPORT_FORMATS:
+        raise ValueError(f'report_format should be one of {REPORT_FORMATS}')
+
+    storage = Dispatcher.get_current().storage
+    await storage.update_bucket(chat=chat_id, report_format=report_format)
+
+
+async def send_report(message: types.Message, df: 'pd.DataFrame',
+                      report_format: str, file_name: str,
+                      text_columns: Optional[dict[str, str]] = None):
+    """
+    Renders the report in the given format and sends it to the chat
+
+    :param file_name: name of the sent file without extension
+    :param text_columns: columns for text format (see :func:`render_text`)
+    """
+
+    if report_format == 'text':
+        await message.answer(render_text(df, columns=text_columns))
+        return
+
+    if report_format not in FILE_RENDERERS:
+        raise ValueError(f'report_format should be one of {REPORT_FORMATS}')
+
+    renderer, extension = FILE_RENDERERS[report_format]
+    file = types.InputFile(io.BytesIO(renderer(df)),
+                           filename=f'{file_name}.{extension}')
+    await message.answer_document(file)
+
+
+class ReportFormatHandler:
+    """
+    Saves format of reports for the chat
+    """
+
+    def __init__(self):
+        self._callback_data_factory = CallbackData('rf', 'report_format')
+
+    def _create_formats_keyboard(self) -> InlineKeyboardMarkup:
+        keyboard = InlineKeyboardMarkup(row_width=4)
+
+        for report_format in REPORT_FORMATS:
+            button = InlineKeyboardButton(
+                text=report_format,
+                callback_data=self._callback_data_factory.new(
+                    report_format=report_format
+                )
+            )
+            keyboard.insert(button)
+
+        return keyboard
+
+    async def handler(self, message: types.Message):
+        logger.info(f'user={message.from_user.id} command={message.text}')
+
+        report_format = message.get_args()
+        if report_format in REPORT_FORMATS:
+            await set_report_format(message.chat.id, report_format)
+            await message.answer(f'Формат отчётов: <b>{report_format}</b>')
+            return
+
+        current_format = await get_report_format(message.chat.id)
+        await message.answer(f'Текущий формат отчётов: <b>{current_format}</b>\n'
+                             f'Выберите формат:',
+                             reply_markup=self._create_formats_keyboard())
+
+    async def chosen_format_handler(self, callback: types.CallbackQuery,
+                                    callback_data: dict[str, str]):
+        report_format = callback_data['report_format']
+        logger.info(f'user={callback.from_user.id} '
+                    f'callback_query={report_format}')
+
+        if report_format not in REPORT_FORMATS:
+            await callback.answer()
+            return
+
+        await set_report_format(callback.message.chat.id, report_format)
+        await callback.answer(text=f'Вы выбрали {report_format}')
+        await callback.message.edit_reply_markup()
+        await callback.message.edit_text(f'Формат отчётов: '
+                                         f'<b>{report_format}</b>')
+
+    def register(self, dp: Dispatcher):
+        dp.register_message_handler(self.handler, commands=['report_format'])
+        dp.register_callback_query_handler(
+            self.chosen_format_handler,
+            self._callback_data_factory.filter()
+        )
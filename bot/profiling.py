@@ -0,0 +1,198 @@
+import cProfile
+import html
+import io
+import logging
+import os
+import pstats
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from time import monotonic, thread_time
+from typing import AsyncIterator, Iterable, Optional, TYPE_CHECKING
+
+from aiogram import Bot, types
+
+if TYPE_CHECKING:
+    from scrapers.departure_stations_reporter import TaskTiming
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StageTiming:
+    """
+    :param wall_time: time from the start to the end of the stage
+    :param cpu_time: time the thread spent executing code (of any task)
+    during the stage, the rest was spent awaiting I/O. None if the stage
+    was measured elsewhere
+    """
+
+    wall_time: float = 0
+    cpu_time: Optional[float] = None
+
+
+@dataclass
+class ReportRun:
+    name: str
+    user_id: int
+    started_at: datetime = field(default_factory=datetime.now)
+    total_time: float = 0
+    stages: dict[str, StageTiming] = field(default_factory=dict)
+    num_tasks: int = 0
+    slowest_tasks: list['TaskTiming'] = field(default_factory=list)
+
+    @contextmanager
+    def stage(self, name: str):
+        wall_start, cpu_start = monotonic(), thread_time()
+        try:
+            yield
+        finally:
+            timing = self.stages.setdefault(name, StageTiming(cpu_time=0))
+            timing.wall_time += monotonic() - wall_start
+            timing.cpu_time += thread_time() - cpu_start
+
+    def add_stage_times(self, stage_times: dict[str, float]):
+        """
+        Adds wall times of stages measured elsewhere (e.g. by reporter)
+        """
+
+        for name, wall_time in stage_times.items():
+            self.stages.setdefault(name, StageTiming()).wall_time += wall_time
+
+    def add_task_timings(self, task_timings: Iterable['TaskTiming'],
+                         num_slowest: int = 3):
+        """
+        Keeps the slowest tasks (by queued + run time) measured
+        by reporter
+        """
+
+        task_timings = list(task_timings)
+        self.num_tasks += len(task_timings)
+        self.slowest_tasks = sorted(
+            self.slowest_tasks + task_timings,
+            key=lambda t: t.queued + t.run, reverse=True
+        )[:num_slowest]
+
+    def format(self) -> str:
+        stages = ' '.join(
+            f'{name}={t.wall_time:.2f}s' if t.cpu_time is None
+            else f'{name}={t.wall_time:.2f}s(cpu={t.cpu_time:.2f}s)'
+            for name, t in self.stages.items()
+        )
+        text = f'{self.started_at:%Y-%m-%d %H:%M:%S} {self.name} ' \
+               f'user={self.user_id} total={self.total_time:.2f}s {stages}'
+        if self.num_tasks:
+            slowest_tasks = ', '.join(
+                f'{t.name}(queued={t.queued:.2f}s '
+                f'wait={t.upstream_wait:.2f}s run={t.run:.2f}s)'
+                for t in self.slowest_tasks
+            )
+            text += f' tasks={self.num_tasks} slowest: {slowest_tasks}'
+        return text
+
+
+class ReportMonitor:
+    """
+    Measures stages of reports, keeps rolling log of slow reports and
+    profiles reports on admin request. Without admin reports are
+    only measured
+    """
+
+    def __init__(self, bot: Optional[Bot] = None,
+                 admin_id: Optional[int] = None,
+                 slow_report_threshold: float = 30, log_size: int = 50,
+                 num_hot_spots: int = 20):
+        self._bot = bot
+        self._admin_id = admin_id
+        self._slow_report_threshold = slow_report_threshold
+        self._slow_reports: deque[ReportRun] = deque(maxlen=log_size)
+        self._num_hot_spots = num_hot_spots
+        self._profile_next = False
+        self._is_profiling = False
+
+    @property
+    def slow_reports(self) -> list[ReportRun]:
+        return list(self._slow_reports)
+
+    def profile_next(self):
+        """
+        Profiles the next report of any user
+        """
+
+        self._profile_next = True
+
+    @asynccontextmanager
+    async def run(self, name: str, user_id: int,
+                  profile: bool = False) -> AsyncIterator[ReportRun]:
+        """
+        Measures the report run and, if requested, profiles it and sends
+        hot spots with the raw profile to admin.
+
+        cProfile profiles the whole thread, so other tasks running
+        concurrently with the report get into the profile too
+        """
+
+        if self._profile_next and not profile:
+            self._profile_next = False
+            profile = True
+        # only one profiler can be active in a thread
+        profile = profile and not self._is_profiling \
+            and self._bot is not None and self._admin_id is not None
+
+        report_run = ReportRun(name, user_id)
+        profiler = cProfile.Profile() if profile else None
+        time_start = monotonic()
+        if profiler is not None:
+            self._is_profiling = True
+            profiler.enable()
+        try:
+            yield report_run
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self._is_profiling = False
+            report_run.total_time = monotonic() - time_start
+
+            if report_run.total_time >= self._slow_report_threshold:
+                self._slow_reports.append(report_run)
+                logger.warning(f'slow report {report_run.format()}')
+            if profiler is not None:
+                await self._send_profile(report_run, profiler)
+
+    async def _send_profile(self, report_run: ReportRun,
+                            profiler: cProfile.Profile):
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE) \
+            .print_stats(self._num_hot_spots)
+        hot_spots = self._shorten_stats(stream.getvalue())
+
+        file_path = f'/tmp/{uuid.uuid4()}.prof'
+        try:
+            profiler.dump_stats(file_path)
+            await self._bot.send_message(
+                self._admin_id,
+                f'{html.escape(report_run.format())}\n\n'
+                f'<pre>{html.escape(hot_spots)}</pre>'
+            )
+            with open(file_path, 'rb') as file:
+                await self._bot.send_document(self._admin_id, types.InputFile(
+                    file, filename=f'{report_run.name}.prof'
+                ))
+        except Exception as err:
+            logger.exception(err)
+        finally:
+            if os.path.isfile(file_path):
+                os.remove(file_path)
+
+    @staticmethod
+    def _shorten_stats(stats: str, max_length: int = 3500) -> str:
+        # skip pstats header and fit into a telegram message
+        lines = stats.strip().splitlines()
+        for i, line in enumerate(lines):
+            if line.lstrip().startswith('ncalls'):
+                lines = lines[i:]
+                break
+        return '\n'.join(lines)[:max_length]
@@ -0,0 +1,79 @@
+import html
+import numbers
+from typing import Optional, TYPE_CHECKING
+
+# file renderers are shared with the batch CLI (python -m scrapers)
+from scrapers.renderers import FILE_RENDERERS
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# telegram limit of message length
+MAX_MESSAGE_LENGTH = 4096
+
+
+def _format_cell(value) -> str:
+    if isinstance(value, numbers.Real):
+        if value != value:  # NaN
+            return '-'
+        if float(value).is_integer():
+            return str(int(value))
+        return f'{value:.2f}'
+    if value is None:
+        return '-'
+    return str(value)
+
+
+def render_text(df: 'pd.DataFrame', top_n: int = 10,
+                columns: Optional[dict[str, str]] = None,
+                max_width: int = 20) -> str:
+    """
+    Renders the first rows of the report as monospace table (HTML)
+
+    :param top_n: number of rows to render
+    :param columns: columns to render mapped to their headers,
+    all columns are rendered by default
+    :param max_width: max width of a column in characters
+    """
+
+    if columns is None:
+        columns = {column: str(column) for column in df.columns}
+    df = df.loc[:, list(columns)].head(top_n)
+
+    headers = [header[:max_width] for header in columns.values()]
+    rows = list(df.itertuples(index=False))
+    cells = [[_format_cell(value)[:max_width] for value in row] for row in rows]
+    widths = [max(len(cell) for cell in column)
+              for column in zip(headers, *cells)]
+
+    lines = [' '.join(h.ljust(w) for h, w in zip(headers, widths))]
+    for row, row_cells in zip(rows, cells):
+        # numbers are aligned to the right, text to the left
+        lines.append(' '.join(
+            c.rjust(w) if isinstance(v, numbers.Real) else c.ljust(w)
+            for v, c, w in zip(row, row_cells, widths)
+        ).rstrip())
+
+    # drop rows which don't fit into a message
+    text = _to_pre(lines)
+    while len(text) > MAX_MESSAGE_LENGTH and len(lines) > 1:
+        lines.pop()
+        text = _to_pre(lines)
+    return text
+
+
+def _to_pre(lines: list[str]) -> str:
+    return '<pre>' + html.escape('\n'.join(lines)) + '</pre>'
+
+
+# columns of departure stations report in text format
+DEPARTURE_STATIONS_TEXT_COLUMNS = {
+    'Название станции (как в калькуляторе)': 'Станция',
+    'Цена (за единицу измерения), руб - Средневзвешенная': 'Цена',
+    'РЖД тариф + 10%': 'Тариф+10%',
+    'Итого': 'Итого',
+}
+
+REPORT_FORMATS = ('xlsx', 'csv', 'csv.gz', 'text')
+DEFAULT_REPORT_FORMAT = 'xlsx'
+
@@ -0,0 +1,37 @@
+import logging
+import sys
+from contextlib import contextmanager
+from time import perf_counter
+
+logger = logging.getLogger(__name__)
+
+# dependencies of reports which should not be loaded before polling starts
+HEAVY_MODULES = ('pandas', 'numpy', 'bs4', 'openpyxl', 'xlrd', 'styleframe')
+
+
+class StartupTimer:
+    """
+    Measures duration of bot startup stages (imports, setup, etc.)
+    """
+
+    def __init__(self):
+        self._start_time = perf_counter()
+        self._stages: list[tuple[str, float]] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        start_time = perf_counter()
+        try:
+            yield
+        finally:
+            self._stages.append((name, perf_counter() - start_time))
+
+    def log(self):
+        for name, duration in self._stages:
+            logger.info(f'startup stage={name} '
+                        f'time={round(duration * 1000, 3)}ms')
+
+        heavy_modules = [m for m in HEAVY_MODULES if m in sys.modules]
+        total_time = perf_counter() - self._start_time
+        logger.info(f'startup total_time={round(total_time * 1000, 3)}ms '
+                    f'heavy_modules={",".join(heavy_modules) or None}')
@@ -0,0 +1,33 @@
+import asyncio
+import logging
+from typing import Optional
+
+import aiohttp
+
+from scrapers import StationDirectory, Station, Priority, request_context
+from scrapers.calculator_scraper import CalculatorScraper
+from scrapers.errors import ApiResponseError, HtmlParsingError
+
+logger = logging.getLogger(__name__)
+
+
+async def lookup_station(station_directory: StationDirectory,
+                         calculator_scraper: CalculatorScraper,
+                         name: str, chat_id: int) \
+        -> tuple[Optional[Station], Optional[list[Station]]]:
+    """
+    Looks up the station entered by user with interactive priority
+
+    :return: the station and suggestions as in
+    :meth:`StationDirectory.lookup`, suggestions are None if calculator
+    API failed (then the station should be accepted as typed
+    and validated later)
+    """
+
+    try:
+        with request_context(Priority.INTERACTIVE, chat_id):
+            return await station_directory.lookup(name, calculator_scraper)
+    except (asyncio.TimeoutError, ApiResponseError, HtmlParsingError,
+            aiohttp.ClientError) as err:
+        logger.warning(f'failed to look up station {name}: {err!r}')
+        return None, None
@@ -1,5 +1,27 @@
 from . import errors
-from .delivery_basis_reporter import DeliveryBasisReporter
-from .departure_stations_reporter import DepartureStationsReporter
+from .scheduler import Priority, request_context
+from .station_directory import StationDirectory, Station
+from .trade_results_cache import TradeResultsCache
 
-__all__ = ('DeliveryBasisReporter', 'DepartureStationsReporter', 'errors')
+__all__ = ('DeliveryBasisReporter', 'DepartureStationsReporter',
+           'ReportProgress', 'TopReport', 'StationDirectory', 'Station',
+           'TradeResultsCache', 'Priority', 'request_context', 'errors')
+
+# reporters pull pandas, numpy and bs4, so they are imported
+# on first access instead of on package import
+_LAZY_ATTRIBUTES = {
+    'DeliveryBasisReporter': '.delivery_basis_reporter',
+    'DepartureStationsReporter': '.departure_stations_reporter',
+    'ReportProgress': '.departure_stations_reporter',
+    'TopReport': '.departure_stations_reporter',
+}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    from importlib import import_module
+    value = getattr(import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    globals()[name] = value
+    return value
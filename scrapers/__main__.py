@@ -0,0 +1,315 @@
+"""
+Generates reports without the bot, e.g. for nightly pipelines.
+
+Usage:
+    python -m scrapers --delivery-basis-report \
+        --departure-stations-report 'АИ-92-К5; Комбинатская' \
+        --output-dir reports --format csv
+    python -m scrapers --departure-stations-file jobs.txt
+
+File of departure stations reports has one '<fuel>; <arrival station>'
+per line. Reports run concurrently and share one calculator session
+and one snapshot of trade results. Every report is written to the output
+directory, summary.json there has timings and failures of all reports.
+Exit code is 1 if any report failed.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import sys
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from time import monotonic
+from typing import Optional, Union
+
+from .calculator_scraper import CalculatorScraper
+from .renderers import FILE_RENDERERS
+from .scheduler import HostBudget, create_scheduler, set_scheduler
+from .station_directory import StationDirectory, Station
+from .trade_results_cache import TradeResultsCache
+from .utils import load_scraper_config
+
+logger = logging.getLogger(__package__)
+
+FILE_FORMATS = tuple(FILE_RENDERERS)
+
+
+@dataclass
+class ReportJob:
+    """
+    :param fuel_name: fuel of departure stations report
+    :param arrival_station: arrival station of departure stations report
+    """
+
+    name: str
+    fuel_name: Optional[str] = None
+    arrival_station: Optional[str] = None
+    file_path: Optional[str] = None
+    error: Optional[str] = None
+    time: float = 0
+    stage_times: dict[str, float] = field(default_factory=dict)
+
+
+def parse_departure_stations_job(value: str) -> ReportJob:
+    fuel_name, _, arrival_station = (arg.strip()
+                                     for arg in value.partition(';'))
+    if not fuel_name or not arrival_station:
+        raise ValueError(f'expected "<fuel>; <arrival station>", '
+                         f'got {value!r}')
+    name = to_file_name(f'departure_stations_report_{fuel_name}_'
+                        f'{arrival_station}')
+    return ReportJob(name, fuel_name, arrival_station)
+
+
+def to_file_name(name: str) -> str:
+    return re.sub(r'[^\w.-]+', '_', name).strip('_')
+
+
+class BatchReporter:
+    """
+    Runs report jobs concurrently with shared trade results
+    and calculator scraper
+    """
+
+    def __init__(self, config_file_path: str, template_file_path: str,
+                 output_dir: str, report_format: str,
+                 station_directory: Optional[StationDirectory] = None,
+                 max_concurrency: int = 4):
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency should be greater than 0')
+        if report_format not in FILE_FORMATS:
+            raise ValueError(f'report_format should be one of {FILE_FORMATS}')
+
+        self._config_file_path = config_file_path
+        self._template_file_path = template_file_path
+        self._output_dir = output_dir
+        self._report_format = report_format
+        self._station_directory = station_directory
+        self._max_concurrency = max_concurrency
+
+        config = load_scraper_config(config_file_path)
+        # trade results are downloaded once and never refreshed, so that
+        # all reports of the run use the same snapshot
+        self._trade_results_cache = TradeResultsCache(config, ttl=math.inf)
+        self._calculator_scraper = CalculatorScraper(config, station_directory)
+
+    async def run(self, jobs: list[ReportJob]) -> dict:
+        """
+        Writes reports and summary to the output directory
+
+        :return: summary
+        """
+
+        os.makedirs(self._output_dir, exist_ok=True)
+        started_at = datetime.now()
+        time_start = monotonic()
+
+        # trade results are downloaded once before reports start
+        trade_results_error = None
+        try:
+            await self._trade_results_cache.get_all_instruments()
+        except Exception as err:
+            logger.exception(err)
+            trade_results_error = repr(err)
+        trade_results_time = monotonic() - time_start
+
+        if trade_results_error is None:
+            semaphore = asyncio.Semaphore(self._max_concurrency)
+
+            async def run_job(job: ReportJob):
+                async with semaphore:
+                    await self._run_job(job)
+
+            await asyncio.gather(*(run_job(job) for job in jobs))
+        else:
+            for job in jobs:
+                job.error = f'failed to get trade results: ' \
+                            f'{trade_results_error}'
+
+        summary = {
+            'started_at': started_at.isoformat(timespec='seconds'),
+            'total_time': monotonic() - time_start,
+            'trade_results_time': trade_results_time,
+            'format': self._report_format,
+            'num_reports': len(jobs),
+            'num_failed': sum(job.error is not None for job in jobs),
+            'reports': [asdict(job) for job in jobs]
+        }
+        with open(os.path.join(self._output_dir, 'summary.json'), 'w') as file:
+            json.dump(summary, file, ensure_ascii=False, indent=2)
+        return summary
+
+    async def _run_job(self, job: ReportJob):
+        # imported lazily as they pull pandas
+        from .delivery_basis_reporter import DeliveryBasisReporter
+        from .departure_stations_reporter import DepartureStationsReporter
+
+        time_start = monotonic()
+        if job.fuel_name is None:
+            reporter = DeliveryBasisReporter(
+                self._template_file_path, self._config_file_path,
+                self._trade_results_cache
+            )
+        else:
+            reporter = DepartureStationsReporter(
+                self._config_file_path, self._station_directory,
+                trade_results_cache=self._trade_results_cache,
+                calculator_scraper=self._calculator_scraper
+            )
+        try:
+            if job.fuel_name is None:
+                report = await reporter.get_report()
+            else:
+                report = await reporter.get_report(
+                    self._resolve_station(job.arrival_station), job.fuel_name
+                )
+
+            renderer, extension = FILE_RENDERERS[self._report_format]
+            # rendering is blocking, other reports keep going meanwhile
+            time_render_start = monotonic()
+            payload = await asyncio.to_thread(renderer, report)
+            reporter.stage_times['render'] = monotonic() - time_render_start
+
+            job.file_path = os.path.join(self._output_dir,
+                                         f'{job.name}.{extension}')
+            with open(job.file_path, 'wb') as file:
+                file.write(payload)
+        except Exception as err:
+            logger.exception(err)
+            job.error = repr(err)
+        finally:
+            await reporter.close()
+            job.time = monotonic() - time_start
+            job.stage_times = dict(reporter.stage_times)
+
+        logger.info(f'report name={job.name} time={job.time:.2f}s '
+                    f'error={job.error}')
+
+    def _resolve_station(self, arrival_station: str) -> Union[str, Station]:
+        # unknown stations are validated by calculator API,
+        # ambiguous names are resolved to the first match of API
+        if self._station_directory is None:
+            return arrival_station
+        station = self._station_directory.get(arrival_station)
+        return station if station is not None else arrival_station
+
+    async def close(self):
+        await self._calculator_scraper.close()
+        await self._trade_results_cache.close()
+
+
+def setup_args_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description=__doc__.split('\n')[1],
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument('--config', type=str,
+                        default='data/scraper_config.yml',
+                        help='scraper config path')
+    parser.add_argument('--template', type=str,
+                        default='data/delivery_basis_template.csv',
+                        help='delivery basis report template path')
+    parser.add_argument('--stations', type=str,
+                        default='data/stations.json',
+                        help='station directory path, used if exists')
+    parser.add_argument('--delivery-basis-report', action='store_true',
+                        help='generate delivery basis report')
+    parser.add_argument('--departure-stations-report', type=str,
+                        action='append', default=[],
+                        metavar='"FUEL; STATION"',
+                        help='generate departure stations report, '
+                             'can be repeated')
+    parser.add_argument('--departure-stations-file', type=str,
+                        help='file with one "FUEL; STATION" per line')
+    parser.add_argument('--output-dir', type=str, default='reports',
+                        help='directory to write reports and summary to')
+    parser.add_argument('--format', type=str, choices=FILE_FORMATS,
+                        default='xlsx', help='format of reports')
+    parser.add_argument('--max-concurrency', type=int, default=4,
+                        help='max number of reports generated at once')
+    parser.add_argument('--calculator-concurrency', type=int, default=4,
+                        help='max number of simultaneous requests '
+                             'to calculator')
+    parser.add_argument('--calculator-rate', type=float, default=5,
+                        help='max number of requests per second '
+                             'to calculator')
+    parser.add_argument('--exchange-concurrency', type=int, default=2,
+                        help='max number of simultaneous requests '
+                             'to exchange')
+    parser.add_argument('--exchange-rate', type=float, default=2,
+                        help='max number of requests per second to exchange')
+    return parser
+
+
+def get_jobs(parser: argparse.ArgumentParser,
+             args: argparse.Namespace) -> list[ReportJob]:
+    values = list(args.departure_stations_report)
+    if args.departure_stations_file is not None:
+        with open(args.departure_stations_file, 'r') as file:
+            values.extend(line for line in file if line.strip())
+
+    jobs = []
+    if args.delivery_basis_report:
+        jobs.append(ReportJob('delivery_basis_report'))
+    try:
+        jobs.extend(parse_departure_stations_job(value) for value in values)
+    except ValueError as err:
+        parser.error(str(err))
+
+    if not jobs:
+        parser.error('no reports requested')
+    names = [job.name for job in jobs]
+    if len(set(names)) != len(names):
+        parser.error('reports are repeated')
+    return jobs
+
+
+async def main() -> int:
+    parser = setup_args_parser()
+    args = parser.parse_args()
+    jobs = get_jobs(parser, args)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='[%(asctime)s] [%(name)s] [%(levelname)s] - %(message)s'
+    )
+
+    # burst is equal to concurrency, so that idle host gets
+    # all its slots at once
+    set_scheduler(create_scheduler(
+        load_scraper_config(args.config),
+        calculator_budget=HostBudget(args.calculator_concurrency,
+                                     args.calculator_rate,
+                                     args.calculator_concurrency),
+        exchange_budget=HostBudget(args.exchange_concurrency,
+                                   args.exchange_rate,
+                                   args.exchange_concurrency)
+    ))
+
+    station_directory = None
+    if os.path.isfile(args.stations):
+        station_directory = StationDirectory(args.stations)
+        station_directory.load()
+
+    batch_reporter = BatchReporter(args.config, args.template,
+                                   args.output_dir, args.format,
+                                   station_directory, args.max_concurrency)
+    try:
+        summary = await batch_reporter.run(jobs)
+    finally:
+        await batch_reporter.close()
+
+    logger.info(f'reports={summary["num_reports"]} '
+                f'failed={summary["num_failed"]} '
+                f'time={summary["total_time"]:.2f}s '
+                f'output_dir={args.output_dir}')
+    return 1 if summary['num_failed'] > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
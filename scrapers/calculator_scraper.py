@@ -1,21 +1,27 @@
+import asyncio
+from typing import Optional, Union
+
 from aiohttp import ClientSession
-from bs4 import BeautifulSoup
 from yarl import URL
 
 from .errors import HtmlParsingError, ApiResponseError, InvalidStationError, \
     InvalidFuelError
 from .requester import Requester
+from .station_directory import StationDirectory, Station
 from .utils import to_multipart_form_data, ScraperConfig
 
 
 class CalculatorScraper:
-    def __init__(self, config: ScraperConfig):
+    def __init__(self, config: ScraperConfig,
+                 station_directory: Optional[StationDirectory] = None):
         self._url = config.CALCULATOR_URL
         self._api_endpoint_url = config.API_ENDPOINT_URL
         self._session = ClientSession(raise_for_status=True)
         self._session.headers['Host'] = URL(self._url).host
         self._requester = Requester(self._session)
+        self._station_directory = station_directory
         self._sessid = None
+        self._sessid_lock = asyncio.Lock()
 
     async def _init_request(self) -> str:
         """
@@ -30,6 +36,8 @@ class CalculatorScraper:
         response_html = await response.text()
 
         # retrieve sessid from response html page
+        # (bs4 is imported lazily to keep it out of bot startup)
+        from bs4 import BeautifulSoup
         bs = BeautifulSoup(response_html, 'html.parser')
         sessid_tag = bs.find(id='sessid')
         if sessid_tag is None:
@@ -38,15 +46,63 @@ class CalculatorScraper:
         sessid = sessid_tag.attrs['value']
         return sessid
 
-    async def get_object_info(self, object_type: str,
-                              object_name: str) -> dict[str, str]:
+    async def _prepare_sessid(self) -> str:
+        # lock prevents concurrent requests from initializing sessid twice
+        async with self._sessid_lock:
+            if self._sessid is None:
+                self._sessid = await self._init_request()
+            return self._sessid
+
+    async def warm_up(self):
         """
-        Returns info about the given object (either station or fuel) from API
+        Opens connection to calculator and initializes sessid, so that
+        the first request doesn't pay for them
 
-        :param object_type: type of the object to get information about
+        Raises :class:`aiohttp.ClientResponseError`,
+        :class:`asyncio.TimeoutError`, :class:`HtmlParsingError`
+        """
+
+        await self._prepare_sessid()
+
+    async def _request_api(self, data: dict) -> dict:
+        """
+        Posts data with sessid to API. Sessid of long-lived scraper
+        may expire, so it is renewed once if API returns error
+
+        Raises :class:`aiohttp.ClientResponseError`,
+        :class:`asyncio.TimeoutError`, :class:`ApiResponseError`,
+        :class:`HtmlParsingError`
+        """
+
+        for _ in range(2):
+            sessid = await self._prepare_sessid()
+            response = await self._requester.request(
+                method='POST',
+                url=self._api_endpoint_url,
+                data=to_multipart_form_data({**data, 'sessid': sessid})
+            )
+            response_json = await response.json()
+            if not response_json.get('error'):
+                return response_json
+
+            async with self._sessid_lock:
+                # concurrent request may have renewed it already
+                if self._sessid == sessid:
+                    self._sessid = None
+
+        raise ApiResponseError()
+
+    async def get_objects_info(self, object_type: str, object_name: str,
+                               limit: int = 1) -> list[dict[str, str]]:
+        """
+        Returns info about objects (either stations or fuels) which names
+        or codes match the given one
+
+        :param object_type: type of the objects to get information about
         (should be either station or fuel)
-        :param object_name: the name of the object
-        :return: dictionary with information
+        :param object_name: the name (or part of the name) of the object
+        :param limit: max number of objects to return
+        :return: list of dictionaries with information
 
         Raises ValueError, :class:`aiohttp.ClientResponseError`,
         :class:`asyncio.TimeoutError`, :class:`ApiResponseError`,
@@ -57,10 +113,6 @@ class CalculatorScraper:
             raise ValueError(f'incorrect argument object_type: {object_type}. '
                              f'should be either station or fuel')
 
-        # prepare sessid
-        if self._sessid is None:
-            self._sessid = await self._init_request()
-
         # set request data
         route = None
         if object_type == 'station':
@@ -69,41 +121,83 @@ class CalculatorScraper:
             route = '/calculator/api/products/filteredByNameOrCode/'
         route += object_name
 
-        form_data = to_multipart_form_data(
+        response_json = await self._request_api(
             {
                 'action': 'getData',
-                'sessid': self._sessid,
                 'route': route,
-                'limit': 1
+                'limit': limit
             }
         )
 
-        response = await self._requester.request(
-            method='POST',
-            url=self._api_endpoint_url,
-            data=form_data
-        )
-        response_json = await response.json()
-
-        if response_json.get('error'):
-            raise ApiResponseError()
-
-        if response_json['data'] is None:
+        if not response_json['data']:
             if object_type == 'station':
                 raise InvalidStationError(object_name)
             elif object_type == 'fuel':
                 raise InvalidFuelError(object_name)
 
-        return response_json['data'][0]
+        return response_json['data']
 
-    async def get_rzd_price_info(self, st1: str, st2: str,
+    async def get_object_info(self, object_type: str,
+                              object_name: str) -> dict[str, str]:
+        """
+        Returns info about the given object (either station or fuel) from API
+
+        :param object_type: type of the object to get information about
+        (should be either station or fuel)
+        :param object_name: the name of the object
+        :return: dictionary with information
+
+        Raises ValueError, :class:`aiohttp.ClientResponseError`,
+        :class:`asyncio.TimeoutError`, :class:`ApiResponseError`,
+        :class:`InvalidStationError`, :class:`InvalidFuelError`
+        """
+
+        return (await self.get_objects_info(object_type, object_name))[0]
+
+    async def get_station_code(self, station: Union[str, Station]) -> str:
+        """
+        Returns code of the station, looking it up in the station
+        directory first to avoid request to API. Ambiguous names
+        (see :class:`StationDirectory`) are resolved to the first
+        match of API
+
+        :param station: name of the station or the station itself
+
+        Raises :class:`aiohttp.ClientResponseError`,
+        :class:`asyncio.TimeoutError`, :class:`ApiResponseError`,
+        :class:`InvalidStationError`
+        """
+
+        if isinstance(station, Station):
+            return station.code
+        station_name = station
+
+        if self._station_directory is not None:
+            station = self._station_directory.get(station_name)
+            if station is not None:
+                return station.code
+
+        station_info = await self.get_object_info(object_type='station',
+                                                  object_name=station_name)
+        station_code = str(station_info['code'])
+        if self._station_directory is not None:
+            self._station_directory.add(
+                [Station(code=station_code,
+                         name=station_info.get('name', station_name))]
+            )
+        return station_code
+
+    async def get_rzd_price_info(self, st1: Union[str, Station],
+                                 st2: Union[str, Station],
                                  fuel: str, weight: int,
                                  capacity: int) -> dict[str, str]:
         """
         Retrieves rzd cost from API
 
-        :param st1: departure station (e.g. Сургут)
-        :param st2: arrival station (e.g. Комбинатская)
+        :param st1: departure station (e.g. Сургут), name or station
+        from directory
+        :param st2: arrival station (e.g. Комбинатская), name or station
+        from directory
         :param fuel: name of the calculator fuel (e.g. ТОПЛИВО ДИЗЕЛЬНОЕ)
         :param weight: (e.g. 65)
         :param capacity: (e.g. 66)
@@ -113,23 +207,16 @@ class CalculatorScraper:
         :class:`asyncio.TimeoutError`, :class:`ApiResponseError`
         """
 
-        # prepare sessid
-        if self._sessid is None:
-            self._sessid = await self._init_request()
-
         # get stations' and fuel's codes
-        st1_code = (await self.get_object_info(object_type='station',
-                                               object_name=st1))['code']
-        st2_code = (await self.get_object_info(object_type='station',
-                                               object_name=st2))['code']
+        st1_code = await self.get_station_code(st1)
+        st2_code = await self.get_station_code(st2)
         fuel_code = (await self.get_object_info(object_type='fuel',
                                                 object_name=fuel))['code']
 
-        # set form data
-        form_data = to_multipart_form_data(
+        # send request
+        response_data = await self._request_api(
             {
                 'action': 'getCalculation',
-                'sessid': self._sessid,
                 'type': 43,  # тип вагона (43 - цистерны для нефтепродуктов)
                 'st1': st1_code,  # код станции отправления
                 'st2': st2_code,  # код станции назначения
@@ -144,16 +231,6 @@ class CalculatorScraper:
             }
         )
 
-        # send request
-        response = await self._requester.request(
-            method='POST',
-            url=self._api_endpoint_url,
-            data=form_data
-        )
-        response_data = await response.json()
-
-        if response_data.get('error'):
-            raise ApiResponseError()
         if response_data['data'] is None:
             raise ApiResponseError('empty response data')
 
@@ -0,0 +1,46 @@
+import sys
+
+import pandas as pd
+
+CATEGORICAL_COLUMNS = (
+    'Код Инструмента',
+    'Базис поставки',
+)
+
+STRING_COLUMNS = (
+    'Наименование Инструмента',
+)
+
+
+def intern_strings(column: pd.Series) -> pd.Series:
+    """
+    :return: column where equal strings are the same (interned) object
+    """
+
+    return column.map(lambda v: sys.intern(v) if isinstance(v, str) else v)
+
+
+def compact_instruments(instruments: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns copy of instruments (as returned by
+    :meth:`TradeResultsScraper.get_all_instruments`) which takes less memory:
+    codes and delivery bases are categorical and instrument names
+    are interned. Prices stay float64 as they are shown in reports
+    """
+
+    instruments = instruments.copy()
+    for column in CATEGORICAL_COLUMNS:
+        instruments[column] = instruments[column].astype('category')
+    for column in STRING_COLUMNS:
+        instruments[column] = intern_strings(instruments[column])
+    return instruments
+
+
+def memory_per_row(df: pd.DataFrame) -> float:
+    """
+    :return: bytes per row including memory of python objects
+    """
+
+    if df.shape[0] == 0:
+        return 0
+    return df.memory_usage(deep=True).sum() / df.shape[0]
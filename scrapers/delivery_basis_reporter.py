@@ -1,6 +1,10 @@
+from time import monotonic
+from typing import Optional
+
 import pandas as pd
 
 from scrapers.trade_results_scraper import TradeResultsScraper
+from .trade_results_cache import TradeResultsCache
 from .utils import load_scraper_config
 
 
@@ -9,13 +13,27 @@ class DeliveryBasisReporter:
     Provides report with fuel prices for given stations
     """
 
-    def __init__(self, template_file_path: str, config_file_path: str):
+    def __init__(self, template_file_path: str, config_file_path: str,
+                 trade_results_cache: Optional[TradeResultsCache] = None):
+        """
+        :param trade_results_cache: shared trade results, if not provided
+        trade results are downloaded by the reporter itself
+        """
+
         self._template_file_path = template_file_path
         config = load_scraper_config(config_file_path)
-        self._trade_results_scraper = TradeResultsScraper(config)
+        self._owns_trade_results_scraper = trade_results_cache is None
+        self._trade_results_scraper = trade_results_cache \
+            or TradeResultsScraper(config)
+        # wall time of report stages, e.g. for slow report log
+        self.stage_times: dict[str, float] = dict()
 
     async def get_report(self) -> pd.DataFrame:
+        time_start = monotonic()
         instruments = await self._trade_results_scraper.get_all_instruments()
+        self.stage_times['trade results'] = monotonic() - time_start
+
+        time_start = monotonic()
         report = pd.read_csv(self._template_file_path)
         report_dict = self._table_to_dict(report)
 
@@ -33,6 +51,7 @@ class DeliveryBasisReporter:
                 if pd.notna(price_delta):
                     price_string += f' ({price_delta})'
                 report.loc[ind, column] = price_string
+        self.stage_times['report'] = monotonic() - time_start
 
         return report
 
@@ -51,4 +70,5 @@ class DeliveryBasisReporter:
         return table_dict
 
     async def close(self):
-        await self._trade_results_scraper.close()
+        if self._owns_trade_results_scraper:
+            await self._trade_results_scraper.close()
@@ -1,9 +1,70 @@
+import asyncio
+import heapq
+import sys
+from dataclasses import dataclass
+from time import monotonic
+from typing import AsyncIterator, Optional, Union
+
 import numpy as np
 import pandas as pd
 
 from .calculator_scraper import CalculatorScraper
+from .scheduler import measure_wait_time
+from .station_directory import StationDirectory, Station
+from .trade_results_cache import TradeResultsCache
 from .trade_results_scraper import TradeResultsScraper
-from .utils import load_scraper_config
+from .utils import load_scraper_config, get_calculator_station_name
+
+
+@dataclass
+class ReportProgress:
+    """
+    Intermediate state of departure stations report
+
+    :param report: report filled with tariffs resolved so far (unsorted)
+    :param done: number of resolved tariffs
+    :param total: number of tariffs to resolve
+    """
+
+    report: pd.DataFrame
+    done: int
+    total: int
+
+
+@dataclass
+class TopReport:
+    """
+    Report with k cheapest departure stations
+
+    :param report: sorted report with at most k rows
+    :param num_tariffs: number of tariffs requested from calculator
+    :param num_tariffs_saved: number of tariffs requested by the full
+    report (see :meth:`DepartureStationsReporter.get_report`) but not
+    by the top report
+    """
+
+    report: pd.DataFrame
+    num_tariffs: int
+    num_tariffs_saved: int
+
+
+@dataclass
+class TaskTiming:
+    """
+    Timing of a tariff task
+
+    :param name: departure station of the tariff
+    :param queued: time the task waited for reporter concurrency limit
+    :param upstream_wait: time requests of the task waited
+    for :class:`UpstreamScheduler` slots
+    :param run: time from start to end of the task (including
+    upstream_wait)
+    """
+
+    name: str
+    queued: float
+    upstream_wait: float
+    run: float
 
 
 class DepartureStationsReporter:
@@ -12,21 +73,170 @@ class DepartureStationsReporter:
     for provided fuel and arrival station
     """
 
-    def __init__(self, config_file_path: str):
+    def __init__(self, config_file_path: str,
+                 station_directory: Optional[StationDirectory] = None,
+                 max_concurrency: int = 5,
+                 trade_results_cache: Optional[TradeResultsCache] = None,
+                 calculator_scraper: Optional[CalculatorScraper] = None):
+        """
+        :param trade_results_cache: shared trade results, if not provided
+        trade results are downloaded by the reporter itself
+        :param calculator_scraper: scraper shared between reporters
+        (its session and sessid are reused), if not provided the reporter
+        creates its own one with the station directory
+        """
+
+        if max_concurrency < 1:
+            raise ValueError('max_concurrency should be greater than 0')
+
         self._config = load_scraper_config(config_file_path)
-        self._trade_results_parser = TradeResultsScraper(self._config)
-        self._calculator_scraper = CalculatorScraper(self._config)
+        self._owns_trade_results_parser = trade_results_cache is None
+        self._trade_results_parser = trade_results_cache \
+            or TradeResultsScraper(self._config)
+        self._owns_calculator_scraper = calculator_scraper is None
+        self._calculator_scraper = calculator_scraper \
+            or CalculatorScraper(self._config, station_directory)
+        self._max_concurrency = max_concurrency
+        # wall time of report stages and timings of tariff tasks,
+        # e.g. for slow report log
+        self.stage_times: dict[str, float] = dict()
+        self.task_timings: list[TaskTiming] = []
 
-    async def get_report(self, calculator_arrival_station: str,
+    async def get_report(self,
+                         calculator_arrival_station: Union[str, Station],
                          fuel_name: str) -> pd.DataFrame:
         """
 
         :param calculator_arrival_station: name of arrival station
-        AS IN CALCULATOR
+        AS IN CALCULATOR or the station from directory (e.g. if the name
+        is ambiguous)
         :param fuel_name:
         :return:
         """
 
+        instruments = None
+        async for progress in self.iter_report(calculator_arrival_station,
+                                               fuel_name):
+            instruments = progress.report
+
+        return self.sort_report(instruments)
+
+    async def iter_report(self,
+                          calculator_arrival_station: Union[str, Station],
+                          fuel_name: str) -> AsyncIterator[ReportProgress]:
+        """
+        Same as :meth:`get_report`, but yields progress every time
+        a tariff is resolved. The report yielded last is complete,
+        but not sorted (see :meth:`sort_report`)
+        """
+
+        instruments = await self._get_instruments(fuel_name)
+
+        # rows with mapped departure station need a tariff
+        rows = instruments.index[
+            instruments['Название станции (как в калькуляторе)'] !=
+            'не удалось сопоставить название'
+        ]
+        yield ReportProgress(instruments, 0, len(rows))
+
+        time_start = monotonic()
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+
+        async def get_rzd_price(i) -> tuple[int, float]:
+            rzd_price = await self._get_timed_rzd_price(
+                instruments, i, calculator_arrival_station, semaphore
+            )
+            return i, rzd_price
+
+        tasks = [asyncio.create_task(get_rzd_price(i)) for i in rows]
+        try:
+            for done, future in enumerate(asyncio.as_completed(tasks), 1):
+                i, rzd_price = await future
+                self._set_rzd_price(instruments, i, rzd_price)
+                yield ReportProgress(instruments, done, len(rows))
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.stage_times['tariffs'] = monotonic() - time_start
+
+    async def get_top_report(self,
+                             calculator_arrival_station: Union[str, Station],
+                             fuel_name: str, k: int) -> TopReport:
+        """
+        Returns k departure stations with the lowest total cost.
+
+        Total cost is fuel price + 1.1 * tariff and tariff is never
+        negative, so fuel price is a lower bound of total cost. Rows are
+        visited in ascending order of fuel price and tariffs are not
+        requested once fuel price reaches the k-th best total cost.
+        Rows without fuel price are skipped as their total cost is unknown
+        """
+
+        if k < 1:
+            raise ValueError('k should be greater than 0')
+
+        instruments = await self._get_instruments(fuel_name)
+        price_column = 'Цена (за единицу измерения), руб - Средневзвешенная'
+
+        mapped = instruments['Название станции (как в калькуляторе)'] != \
+            'не удалось сопоставить название'
+        candidates = instruments.loc[
+            mapped & instruments[price_column].notna(), price_column
+        ].sort_values()
+
+        time_start = monotonic()
+        # max-heap (negated) of k best total costs found so far
+        best_totals = []
+        visited = []
+        position = 0
+        while position < len(candidates):
+            # take next batch of rows which can still get into top k
+            batch = []
+            while position < len(candidates) \
+                    and len(batch) < self._max_concurrency:
+                if len(best_totals) == k \
+                        and candidates.iloc[position] >= -best_totals[0]:
+                    position = len(candidates)
+                    break
+                batch.append(candidates.index[position])
+                position += 1
+
+            tasks = [
+                asyncio.create_task(self._get_timed_rzd_price(
+                    instruments, i, calculator_arrival_station
+                ))
+                for i in batch
+            ]
+            try:
+                rzd_prices = await asyncio.gather(*tasks)
+            finally:
+                # on error the rest of the batch must not outlive the report
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+            for i, rzd_price in zip(batch, rzd_prices):
+                self._set_rzd_price(instruments, i, rzd_price)
+                total_cost = instruments.loc[i, 'Итого']
+                if len(best_totals) < k:
+                    heapq.heappush(best_totals, -total_cost)
+                elif total_cost < -best_totals[0]:
+                    heapq.heapreplace(best_totals, -total_cost)
+            visited.extend(batch)
+        self.stage_times['tariffs'] = monotonic() - time_start
+
+        report = self.sort_report(instruments.loc[visited, :]).head(k)
+        # full report requests tariffs of all mapped rows
+        return TopReport(report=report,
+                         num_tariffs=len(visited),
+                         num_tariffs_saved=int(mapped.sum()) - len(visited))
+
+    async def _get_instruments(self, fuel_name: str) -> pd.DataFrame:
+        """
+        :return: instruments of the given fuel with added report columns
+        and mapped calculator departure stations
+        """
+
         if fuel_name not in self._config.FUEL_NAME_TO_INSTRUMENT_CODES.keys():
             raise ValueError(
                 f'fuel_name should be one of '
@@ -40,7 +250,11 @@ class DepartureStationsReporter:
         calculator_fuel_name = self._config.FUEL_NAME_TO_CALCULATOR_ITEM[fuel_name]
         calculator_fuel_weight = self._config.CALCULATOR_ITEM_WEIGHTS[calculator_fuel_name]
 
+        time_start = monotonic()
         all_instruments = await self._trade_results_parser.get_all_instruments()
+        self.stage_times['trade results'] = monotonic() - time_start
+
+        time_start = monotonic()
         # filter all instruments by instrument code prefixes
         instruments = all_instruments.loc[
                             all_instruments['Код Инструмента'].str.startswith(
@@ -56,43 +270,78 @@ class DepartureStationsReporter:
         instruments.loc[:, 'РЖД тариф + 10%'] = np.NaN
         instruments.loc[:, 'Итого'] = np.NaN
 
-        # iterate through all the instruments
+        # map delivery basis to calculator station name
         for i in instruments.index:
-
-            # 1) map delivery basis to calculator fuel name
             delivery_basis = instruments.loc[i, 'Базис поставки']
-            if self._config.DELIVERY_BASIS_TO_CALCULATOR_STATION_NAME.get(delivery_basis):
-                calculator_departure_station = \
-                    self._config.DELIVERY_BASIS_TO_CALCULATOR_STATION_NAME[delivery_basis]
-            elif delivery_basis.startswith('ст. '):
-                calculator_departure_station = delivery_basis[4:]
-            else:
-                instruments.loc[i, 'Название станции (как в калькуляторе)'] = \
-                    'не удалось сопоставить название'
-                continue
+            calculator_departure_station = get_calculator_station_name(
+                self._config, delivery_basis
+            ) or 'не удалось сопоставить название'
 
+            # equal station names share one object across reports
             instruments.loc[i, 'Название станции (как в калькуляторе)'] = \
-                calculator_departure_station
-
-            # 2) rzd cost
-            rzd_price_info = await self._calculator_scraper.get_rzd_price_info(
-                st1=calculator_departure_station,
-                st2=calculator_arrival_station,
-                fuel=calculator_fuel_name,
-                weight=calculator_fuel_weight,
-                capacity=66
-            )
-            rzd_price = float(rzd_price_info['sumtWithVat'])
-            instruments.loc[i, 'РЖД тариф'] = rzd_price
-            instruments.loc[i, 'РЖД тариф + 10%'] = rzd_price * 1.1
+                sys.intern(calculator_departure_station)
+        self.stage_times['instruments'] = monotonic() - time_start
+
+        return instruments
 
-            # 3) total cost
-            fuel_price = instruments.loc[i, 'Цена (за единицу измерения), руб - Средневзвешенная']
-            if pd.notna(fuel_price):
-                total_cost = fuel_price + rzd_price * 1.1
-                instruments.loc[i, 'Итого'] = total_cost
+    async def _get_timed_rzd_price(
+            self, instruments: pd.DataFrame, i,
+            calculator_arrival_station: Union[str, Station],
+            semaphore: Optional[asyncio.Semaphore] = None) -> float:
+        """
+        Same as :meth:`_get_rzd_price`, but records timing of the task
+        to :attr:`task_timings` (even if it fails)
+        """
 
-        # sort
+        time_created = monotonic()
+        if semaphore is not None:
+            await semaphore.acquire()
+        time_start = monotonic()
+        try:
+            with measure_wait_time() as wait_times:
+                return await self._get_rzd_price(instruments, i,
+                                                 calculator_arrival_station)
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+            self.task_timings.append(TaskTiming(
+                name=instruments.loc[i, 'Название станции (как в калькуляторе)'],
+                queued=time_start - time_created,
+                upstream_wait=sum(wait_times),
+                run=monotonic() - time_start
+            ))
+
+    async def _get_rzd_price(
+            self, instruments: pd.DataFrame, i,
+            calculator_arrival_station: Union[str, Station]) -> float:
+        """
+        Raises :class:`aiohttp.ClientResponseError`,
+        :class:`asyncio.TimeoutError`, :class:`ApiResponseError`,
+        :class:`InvalidStationError`, :class:`InvalidFuelError`
+        """
+
+        rzd_price_info = await self._calculator_scraper.get_rzd_price_info(
+            st1=instruments.loc[i, 'Название станции (как в калькуляторе)'],
+            st2=calculator_arrival_station,
+            fuel=instruments.loc[i, 'Название топлива (как в калькуляторе)'],
+            weight=int(instruments.loc[i, 'Вес топлива (проставляемый в калькуляторе)']),
+            capacity=66
+        )
+        return float(rzd_price_info['sumtWithVat'])
+
+    @staticmethod
+    def _set_rzd_price(instruments: pd.DataFrame, i, rzd_price: float):
+        instruments.loc[i, 'РЖД тариф'] = rzd_price
+        instruments.loc[i, 'РЖД тариф + 10%'] = rzd_price * 1.1
+
+        # total cost
+        fuel_price = instruments.loc[i, 'Цена (за единицу измерения), руб - Средневзвешенная']
+        if pd.notna(fuel_price):
+            total_cost = fuel_price + rzd_price * 1.1
+            instruments.loc[i, 'Итого'] = total_cost
+
+    @staticmethod
+    def sort_report(instruments: pd.DataFrame) -> pd.DataFrame:
         instruments.sort_values(
             by=['Итого',
                 'РЖД тариф + 10%',
@@ -102,9 +351,10 @@ class DepartureStationsReporter:
             na_position='last',
             inplace=True
         )
-
         return instruments
 
     async def close(self):
-        await self._calculator_scraper.close()
-        await self._trade_results_parser.close()
+        if self._owns_calculator_scraper:
+            await self._calculator_scraper.close()
+        if self._owns_trade_results_parser:
+            await self._trade_results_parser.close()
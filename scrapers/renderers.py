@@ -0,0 +1,64 @@
+import gzip
+import os
+import uuid
+from typing import Callable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def save_as_xl(df: 'pd.DataFrame', path: str):
+    # styleframe is heavy and is only needed for xlsx reports
+    from styleframe import StyleFrame, Styler, utils
+
+    writer = StyleFrame.ExcelWriter(path)
+    frame = StyleFrame(df)
+
+    frame.apply_column_style(
+        cols_to_style=frame.columns,
+        styler_obj=Styler(bg_color=utils.colors.white,
+                          font=utils.fonts.arial,
+                          font_size=12),
+        style_header=True
+    )
+
+    frame.apply_headers_style(
+        styler_obj=Styler(
+            bold=True,
+            font_size=14,
+        )
+    )
+
+    frame.set_column_width(columns=frame.columns, width=40)
+    frame.set_row_height(rows=frame.row_indexes, height=30)
+
+    frame.to_excel(excel_writer=writer, sheet_name='Sheet1')
+    writer.save()
+
+
+def render_xlsx(df: 'pd.DataFrame') -> bytes:
+    file_path = f'/tmp/{uuid.uuid4()}.xlsx'
+    try:
+        save_as_xl(df, file_path)
+        with open(file_path, 'rb') as file:
+            return file.read()
+    finally:
+        if os.path.isfile(file_path):
+            os.remove(file_path)
+
+
+def render_csv(df: 'pd.DataFrame') -> bytes:
+    # BOM makes Excel detect utf-8 (cyrillic column names)
+    return df.to_csv(index=False).encode('utf-8-sig')
+
+
+def render_csv_gz(df: 'pd.DataFrame') -> bytes:
+    return gzip.compress(render_csv(df))
+
+
+# format name -> (renderer, file extension)
+FILE_RENDERERS: dict[str, tuple[Callable[['pd.DataFrame'], bytes], str]] = {
+    'xlsx': (render_xlsx, 'xlsx'),
+    'csv': (render_csv, 'csv'),
+    'csv.gz': (render_csv_gz, 'csv.gz'),
+}
@@ -3,13 +3,20 @@ import logging
 from time import monotonic
 
 from aiohttp import ClientSession, ClientResponse
+from yarl import URL
+
+from .scheduler import get_scheduler
 
 logger = logging.getLogger(__name__)
 
 
 class Requester:
     """
-    Wrapper around ClientSession to enable retries and log requests
+    Wrapper around ClientSession to enable retries and log requests.
+    Every attempt waits for a slot of the process-wide
+    :class:`UpstreamScheduler` and holds it until the response body
+    is read, so the returned response is already read
+    (use :meth:`ClientResponse.read`, ``text`` or ``json``)
     """
 
     def __init__(self, session: ClientSession,
@@ -30,22 +37,29 @@ class Requester:
 
         timeout = self._init_timeout
         response = None
+        host = URL(url).host
 
         for _ in range(self._num_tries):
-            time_start = monotonic()
-            try:
-                response = await self._session.request(
-                    method, url, timeout=timeout, **kwargs
-                )
-            except asyncio.TimeoutError:
-                self._log_timeout(method, url, timeout)
-            else:
-                time_end = monotonic()
-                self._log_response(response, time_end - time_start)
-                if response.status < 500:
-                    break
-            finally:
-                timeout *= 2
+            async with get_scheduler().slot(host) as wait_time:
+                time_start = monotonic()
+                try:
+                    attempt_response = await self._session.request(
+                        method, url, timeout=timeout, **kwargs
+                    )
+                    # body is downloaded within the slot too, timeout
+                    # covers the whole attempt
+                    await attempt_response.read()
+                    response = attempt_response
+                except asyncio.TimeoutError:
+                    self._log_timeout(method, url, timeout)
+                else:
+                    time_end = monotonic()
+                    self._log_response(response, time_end - time_start,
+                                       wait_time)
+                    if response.status < 500:
+                        break
+                finally:
+                    timeout *= 2
 
         if response is None:
             raise asyncio.TimeoutError()
@@ -53,14 +67,16 @@ class Requester:
         return response
 
     @staticmethod
-    def _log_response(response: ClientResponse, time: float):
+    def _log_response(response: ClientResponse, time: float,
+                      wait_time: float):
         log_message = ' '.join(
             (
                 'request',
                 f'method={response.method}',
                 f'url={response.url}',
                 f'status={response.status}',
-                f'time={round(time * 1000, 3)}ms'
+                f'time={round(time * 1000, 3)}ms',
+                f'wait={round(wait_time * 1000, 3)}ms'
             )
         )
         if response.ok:
@@ -0,0 +1,311 @@
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from enum import IntEnum
+from time import monotonic
+from typing import AsyncIterator, Hashable, Iterator, Optional, \
+    TYPE_CHECKING
+
+from yarl import URL
+
+if TYPE_CHECKING:
+    from .utils import ScraperConfig
+
+
+class Priority(IntEnum):
+    """
+    Priority classes of upstream requests (lower value goes first)
+    """
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+_request_context: ContextVar[tuple[Priority, Optional[Hashable]]] = \
+    ContextVar('request_context', default=(Priority.INTERACTIVE, None))
+_wait_times: ContextVar[Optional[list[float]]] = \
+    ContextVar('wait_times', default=None)
+
+
+@contextmanager
+def request_context(priority: Priority = Priority.INTERACTIVE,
+                    user: Optional[Hashable] = None):
+    """
+    Sets priority and user of upstream requests made within the context
+    (including tasks created within it)
+
+    :param user: key requests of different users are served in turns by,
+    the bot uses chat id (callback messages are sent by the bot itself,
+    so their chat is the only stable key)
+    """
+
+    token = _request_context.set((priority, user))
+    try:
+        yield
+    finally:
+        _request_context.reset(token)
+
+
+@contextmanager
+def measure_wait_time() -> Iterator[list[float]]:
+    """
+    Collects queue wait times of upstream requests made within
+    the context into the yielded list. Should be entered inside the task
+    whose requests are measured, as tasks created within the context
+    share the list
+    """
+
+    wait_times = []
+    token = _wait_times.set(wait_times)
+    try:
+        yield wait_times
+    finally:
+        _wait_times.reset(token)
+
+
+@dataclass
+class HostBudget:
+    """
+    :param concurrency: max number of simultaneous requests to the host
+    :param rate: max number of requests per second to the host
+    :param burst: max number of requests which can be sent at once
+    if there were no requests for a while
+    """
+
+    concurrency: int = 4
+    rate: float = 5
+    burst: int = 5
+
+    def __post_init__(self):
+        if self.concurrency < 1:
+            raise ValueError('concurrency should be greater than 0')
+        if self.rate <= 0:
+            raise ValueError('rate should be greater than 0')
+        if self.burst < 1:
+            raise ValueError('burst should be greater than 0')
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = monotonic()
+
+    def _update(self):
+        now = monotonic()
+        self._tokens = min(self._capacity,
+                           self._tokens + (now - self._updated_at) * self._rate)
+        self._updated_at = now
+
+    def try_take(self) -> float:
+        """
+        Takes a token if there is one
+
+        :return: 0 if token was taken, otherwise time in seconds
+        until the next token is available
+        """
+
+        self._update()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self._rate
+
+    def give_back(self):
+        self._tokens = min(self._capacity, self._tokens + 1)
+
+
+@dataclass
+class QueueWaitStats:
+    count: int = 0
+    total_time: float = 0
+    max_time: float = 0
+
+    @property
+    def mean_time(self) -> float:
+        return self.total_time / self.count if self.count else 0
+
+    def add(self, wait_time: float):
+        self.count += 1
+        self.total_time += wait_time
+        self.max_time = max(self.max_time, wait_time)
+
+
+class _HostQueue:
+    def __init__(self, budget: HostBudget):
+        self.budget = budget
+        self.bucket = TokenBucket(budget.rate, budget.burst)
+        self.num_active = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+        # priority -> user -> waiters, users are served in round-robin
+        self.waiters: dict[Priority, OrderedDict[Hashable, deque[asyncio.Future]]] = {
+            priority: OrderedDict() for priority in Priority
+        }
+
+    def push(self, priority: Priority, user: Optional[Hashable],
+             future: asyncio.Future):
+        self.waiters[priority].setdefault(user, deque()).append(future)
+
+    def pop(self) -> Optional[asyncio.Future]:
+        """
+        :return: the next waiter (not cancelled) of the highest priority,
+        taking users in turns
+        """
+
+        for priority in Priority:
+            users = self.waiters[priority]
+            while users:
+                user, futures = next(iter(users.items()))
+                future = futures.popleft()
+                if futures:
+                    users.move_to_end(user)
+                else:
+                    del users[user]
+                if not future.done():
+                    return future
+        return None
+
+    def has_waiters(self) -> bool:
+        return any(self.waiters.values())
+
+
+class UpstreamScheduler:
+    """
+    Limits concurrency and rate of requests to every upstream host.
+    Waiting requests are served in order of priority and, within
+    a priority, in turns across users
+    """
+
+    def __init__(self, default_budget: Optional[HostBudget] = None,
+                 host_budgets: Optional[dict[str, HostBudget]] = None):
+        self._default_budget = default_budget or HostBudget()
+        self._host_budgets = host_budgets or dict()
+        self._hosts: dict[str, _HostQueue] = dict()
+        self._queue_wait_stats: dict[tuple[str, Priority], QueueWaitStats] = dict()
+
+    def _get_host_queue(self, host: str) -> _HostQueue:
+        if host not in self._hosts:
+            budget = self._host_budgets.get(host, self._default_budget)
+            self._hosts[host] = _HostQueue(budget)
+        return self._hosts[host]
+
+    @asynccontextmanager
+    async def slot(self, host: str) -> AsyncIterator[float]:
+        """
+        Waits until a request to the host is allowed. Priority and user
+        are taken from :func:`request_context`
+
+        :return: time in seconds the request waited in queue
+        """
+
+        priority, user = _request_context.get()
+        host_queue = self._get_host_queue(host)
+
+        time_start = monotonic()
+        await self._acquire(host_queue, priority, user)
+        wait_time = monotonic() - time_start
+        self._queue_wait_stats.setdefault((host, priority), QueueWaitStats()) \
+            .add(wait_time)
+        wait_times = _wait_times.get()
+        if wait_times is not None:
+            wait_times.append(wait_time)
+
+        try:
+            yield wait_time
+        finally:
+            host_queue.num_active -= 1
+            self._dispatch(host_queue)
+
+    async def _acquire(self, host_queue: _HostQueue, priority: Priority,
+                       user: Optional[Hashable]):
+        if not host_queue.has_waiters() \
+                and host_queue.num_active < host_queue.budget.concurrency \
+                and host_queue.bucket.try_take() == 0:
+            host_queue.num_active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        host_queue.push(priority, user, future)
+        self._dispatch(host_queue)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # slot was granted right before cancellation
+                host_queue.num_active -= 1
+                self._dispatch(host_queue)
+            raise
+
+    def _dispatch(self, host_queue: _HostQueue):
+        """
+        Grants slots to waiters while budget allows
+        """
+
+        while host_queue.num_active < host_queue.budget.concurrency \
+                and host_queue.has_waiters():
+            if host_queue.timer is not None:
+                return
+
+            delay = host_queue.bucket.try_take()
+            if delay > 0:
+                host_queue.timer = asyncio.get_running_loop().call_later(
+                    delay, self._on_timer, host_queue
+                )
+                return
+
+            future = host_queue.pop()
+            if future is None:
+                # all waiters were cancelled, give the token back
+                host_queue.bucket.give_back()
+                return
+            host_queue.num_active += 1
+            future.set_result(None)
+
+    def _on_timer(self, host_queue: _HostQueue):
+        host_queue.timer = None
+        self._dispatch(host_queue)
+
+    def get_queue_wait_stats(self) -> dict[tuple[str, Priority], QueueWaitStats]:
+        """
+        :return: queue wait time stats by host and priority
+        """
+
+        return dict(self._queue_wait_stats)
+
+
+_scheduler: Optional[UpstreamScheduler] = None
+
+
+def get_scheduler() -> UpstreamScheduler:
+    """
+    :return: process-wide scheduler used by :class:`Requester`
+    """
+
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = UpstreamScheduler()
+    return _scheduler
+
+
+def set_scheduler(scheduler: UpstreamScheduler):
+    global _scheduler
+    _scheduler = scheduler
+
+
+def create_scheduler(config: 'ScraperConfig', calculator_budget: HostBudget,
+                     exchange_budget: HostBudget) -> UpstreamScheduler:
+    """
+    :param calculator_budget: budget of calculator page and its API
+    (shared if they are on one host)
+    :param exchange_budget: budget of exchange trade results
+    :return: scheduler with budgets of the configured hosts
+    """
+
+    return UpstreamScheduler(host_budgets={
+        URL(config.CALCULATOR_URL).host: calculator_budget,
+        URL(config.API_ENDPOINT_URL).host: calculator_budget,
+        URL(config.TRADE_RESULTS_URL).host: exchange_budget
+    })
@@ -0,0 +1,251 @@
+import difflib
+import json
+import logging
+import os
+import re
+from bisect import bisect_left
+from dataclasses import dataclass, asdict
+from typing import Iterable, Optional, TYPE_CHECKING
+
+from .errors import InvalidStationError
+
+if TYPE_CHECKING:
+    from .calculator_scraper import CalculatorScraper
+
+logger = logging.getLogger(__name__)
+
+# queries used to enumerate stations via filteredByNameOrCode
+SYNC_QUERIES = tuple('абвгдеёжзийклмнопрстуфхцчшщъыьэюя')
+# queries which hit the limit are refined with one more letter
+# up to this length
+MAX_SYNC_QUERY_LENGTH = 3
+
+
+def normalize_station_name(name: str) -> str:
+    """
+    Lowercases the name, replaces ё with е and collapses punctuation
+    and whitespace, so that 'Комбинатская ' and 'КОМБИНАТСКАЯ' match
+    """
+
+    name = name.lower().replace('ё', 'е')
+    name = re.sub(r'[\W_]+', ' ', name)
+    return ' '.join(name.split())
+
+
+@dataclass(frozen=True)
+class Station:
+    code: str
+    name: str
+
+
+class StationDirectory:
+    """
+    Local directory of calculator stations indexed by normalized name.
+    Supports exact, prefix and fuzzy lookups without requests to API.
+
+    Different stations may have equal names (e.g. several Заводская),
+    such names are ambiguous and are not resolved to a station
+    """
+
+    def __init__(self, file_path: Optional[str] = None):
+        self._file_path = file_path
+        self._by_name: dict[str, list[Station]] = dict()
+        self._by_code: dict[str, Station] = dict()
+        self._sorted_names: list[str] = []
+
+    def __len__(self) -> int:
+        return len(self._by_code)
+
+    def add(self, stations: Iterable[Station]) -> int:
+        """
+        :return: number of stations which were not in the directory before
+        """
+
+        num_added = 0
+        is_changed = False
+        for station in stations:
+            normalized_name = normalize_station_name(station.name)
+            if not normalized_name:
+                continue
+
+            old_station = self._by_code.get(station.code)
+            if old_station == station:
+                continue
+            if old_station is None:
+                num_added += 1
+            else:
+                # station was renamed
+                self._remove_name(old_station)
+
+            self._by_name.setdefault(normalized_name, []).append(station)
+            self._by_code[station.code] = station
+            is_changed = True
+
+        if is_changed:
+            self._sorted_names = sorted(self._by_name)
+        return num_added
+
+    def _remove_name(self, station: Station):
+        normalized_name = normalize_station_name(station.name)
+        stations = self._by_name[normalized_name]
+        stations.remove(station)
+        if not stations:
+            del self._by_name[normalized_name]
+
+    def get(self, name: str) -> Optional[Station]:
+        """
+        :return: the station with the given name or None if there is
+        no such station or the name is ambiguous
+        """
+
+        stations = self.get_all(name)
+        return stations[0] if len(stations) == 1 else None
+
+    def get_all(self, name: str) -> list[Station]:
+        """
+        :return: all stations with the given name
+        """
+
+        return list(self._by_name.get(normalize_station_name(name), ()))
+
+    def get_by_code(self, code: str) -> Optional[Station]:
+        return self._by_code.get(code)
+
+    def find_by_prefix(self, prefix: str, limit: int = 5) -> list[Station]:
+        prefix = normalize_station_name(prefix)
+        if not prefix:
+            return []
+
+        stations = []
+        i = bisect_left(self._sorted_names, prefix)
+        while (i < len(self._sorted_names) and len(stations) < limit
+               and self._sorted_names[i].startswith(prefix)):
+            stations.extend(self._by_name[self._sorted_names[i]])
+            i += 1
+        return stations[:limit]
+
+    def find_similar(self, name: str, limit: int = 5,
+                     cutoff: float = 0.6) -> list[Station]:
+        names = difflib.get_close_matches(normalize_station_name(name),
+                                          self._sorted_names,
+                                          n=limit, cutoff=cutoff)
+        return [station for n in names for station in self._by_name[n]][:limit]
+
+    def suggest(self, name: str, limit: int = 5) -> list[Station]:
+        """
+        :return: stations starting with the given name followed by
+        stations with similar names (best matches first)
+        """
+
+        suggestions = self.find_by_prefix(name, limit)
+        for station in self.find_similar(name, limit):
+            if len(suggestions) >= limit:
+                break
+            if station not in suggestions:
+                suggestions.append(station)
+        return suggestions
+
+    def _match(self, name: str) -> list[Station]:
+        # station code identifies the station even if its name is ambiguous
+        station = self.get_by_code(name.strip())
+        if station is not None:
+            return [station]
+        return self.get_all(name)
+
+    async def lookup(self, name: str, calculator_scraper: 'CalculatorScraper',
+                     limit: int = 5) -> tuple[Optional[Station], list[Station]]:
+        """
+        Finds the station by name or code in the directory and, if it is
+        missing there or the name is ambiguous, in calculator API. Stations
+        found in API are added to the directory, as sync can't enumerate
+        all of them
+
+        :return: the station if exactly one station matches, otherwise
+        suggestions (all stations with the ambiguous name or stations
+        found in API first)
+
+        Raises :class:`aiohttp.ClientResponseError`,
+        :class:`asyncio.TimeoutError`, :class:`ApiResponseError`,
+        :class:`HtmlParsingError`
+        """
+
+        stations = self._match(name)
+        if len(stations) == 1:
+            return stations[0], []
+
+        try:
+            stations_info = await calculator_scraper.get_objects_info(
+                object_type='station', object_name=name, limit=limit
+            )
+        except InvalidStationError:
+            stations_info = []
+        found_stations = [Station(code=str(info['code']), name=info['name'])
+                          for info in stations_info]
+        self.add(found_stations)
+
+        stations = self._match(name)
+        if len(stations) == 1:
+            return stations[0], []
+        if stations:
+            return None, stations
+
+        suggestions = found_stations[:limit]
+        for station in self.suggest(name, limit):
+            if len(suggestions) >= limit:
+                break
+            if station not in suggestions:
+                suggestions.append(station)
+        return None, suggestions
+
+    def load(self):
+        if self._file_path is None or not os.path.isfile(self._file_path):
+            return
+
+        with open(self._file_path, 'r') as file:
+            data = json.load(file)
+        self.add(Station(**item) for item in data)
+        logger.info(f'loaded {len(self)} stations from {self._file_path}')
+
+    def save(self):
+        if self._file_path is None:
+            return
+
+        tmp_file_path = self._file_path + '.tmp'
+        with open(tmp_file_path, 'w') as file:
+            json.dump([asdict(s) for s in self._by_code.values()], file,
+                      ensure_ascii=False)
+        os.replace(tmp_file_path, self._file_path)
+
+    async def sync(self, calculator_scraper: 'CalculatorScraper',
+                   queries: Iterable[str] = SYNC_QUERIES,
+                   limit: int = 5000):
+        """
+        Fetches stations from calculator API and saves the directory
+
+        Raises :class:`aiohttp.ClientResponseError`,
+        :class:`asyncio.TimeoutError`, :class:`ApiResponseError`,
+        :class:`HtmlParsingError`
+        """
+
+        num_added = 0
+        queries = list(queries)
+        while queries:
+            query = queries.pop(0)
+            try:
+                stations_info = await calculator_scraper.get_objects_info(
+                    object_type='station', object_name=query, limit=limit
+                )
+            except InvalidStationError:
+                continue
+            num_added += self.add(
+                Station(code=str(info['code']), name=info['name'])
+                for info in stations_info
+            )
+            # the rest of stations matching the query is cut off by limit
+            if len(stations_info) >= limit \
+                    and len(query) < MAX_SYNC_QUERY_LENGTH:
+                queries.extend(query + letter for letter in SYNC_QUERIES)
+
+        logger.info(f'synced station directory: stations={len(self)} '
+                    f'new={num_added}')
+        self.save()
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from time import monotonic
+from typing import Awaitable, Callable, Optional, TYPE_CHECKING
+
+from .utils import ScraperConfig
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from .trade_results_scraper import TradeResultsScraper
+
+logger = logging.getLogger(__name__)
+
+
+class TradeResultsCache:
+    """
+    Keeps the latest trade results shared between reports, so that
+    the trade results file is downloaded once per ttl instead of once
+    per report. Has the same interface as :class:`TradeResultsScraper`.
+    Trade results are kept in compact form (see :func:`compact_instruments`).
+
+    The trade results file is downloaded only when its url changes
+    (i.e. new trade results are published), listeners are called
+    with the new instruments in background tasks
+    """
+
+    def __init__(self, config: ScraperConfig, ttl: float = 10 * 60):
+        if ttl <= 0:
+            raise ValueError('ttl should be greater than 0')
+
+        self._config = config
+        self._ttl = ttl
+        self._scraper: Optional['TradeResultsScraper'] = None
+        self._instruments: Optional['pd.DataFrame'] = None
+        self._updated_at: Optional[float] = None
+        self._file_url: Optional[str] = None
+        self._lock = asyncio.Lock()
+        self._listeners: list[Callable[['pd.DataFrame', str], Awaitable]] = []
+        self._listener_tasks: set[asyncio.Task] = set()
+
+    def add_listener(self,
+                     listener: Callable[['pd.DataFrame', str], Awaitable]):
+        """
+        :param listener: coroutine function called with copy of all
+        instruments and url of trade results file every time new
+        trade results are downloaded
+        """
+
+        self._listeners.append(listener)
+
+    async def get_all_instruments(self) -> 'pd.DataFrame':
+        """
+        :return: copy of the cached DataFrame of all instruments
+
+        Raises :class:`aiohttp.ClientResponseError`,
+        :class:`asyncio.TimeoutError`, :class:`HtmlParsingError`
+        """
+
+        async with self._lock:
+            if self._instruments is None \
+                    or monotonic() - self._updated_at > self._ttl:
+                await self._refresh()
+        return self._instruments.copy()
+
+    async def refresh(self):
+        """
+        Checks for new trade results regardless of ttl
+
+        Raises :class:`aiohttp.ClientResponseError`,
+        :class:`asyncio.TimeoutError`, :class:`HtmlParsingError`
+        """
+
+        async with self._lock:
+            await self._refresh()
+
+    async def _refresh(self):
+        # imported lazily as they pull pandas
+        from .compact import compact_instruments
+        from .trade_results_scraper import TradeResultsScraper
+
+        if self._scraper is None:
+            self._scraper = TradeResultsScraper(self._config)
+
+        file_url = await self._scraper.get_trade_results_file_url()
+        if file_url != self._file_url or self._instruments is None:
+            self._instruments = compact_instruments(
+                await self._scraper.get_all_instruments(file_url)
+            )
+            self._file_url = file_url
+            logger.info(f'new trade results: url={file_url} '
+                        f'instruments={self._instruments.shape[0]}')
+            for listener in self._listeners:
+                task = asyncio.create_task(
+                    listener(self._instruments.copy(), file_url)
+                )
+                # keep reference until the task is done
+                self._listener_tasks.add(task)
+                task.add_done_callback(self._listener_tasks.discard)
+        self._updated_at = monotonic()
+
+    async def close(self):
+        if self._scraper is not None:
+            await self._scraper.close()
@@ -1,3 +1,5 @@
+from typing import Optional
+
 import numpy as np
 import pandas as pd
 from aiohttp import ClientSession
@@ -16,9 +18,10 @@ class TradeResultsScraper:
         self._session.headers['Host'] = URL(self._url).host
         self._requester = Requester(self._session)
 
-    async def _get_trade_results(self) -> pd.DataFrame:
+    async def get_trade_results_file_url(self) -> str:
         """
-        Downloads the latest trade results
+        :return: url of the latest trade results file (changes when
+        new trade results are published)
 
         Raises :class:`aiohttp.ClientResponseError`,
         :class:`asyncio.TimeoutError`, :class:`HtmlParsingError`
@@ -33,12 +36,23 @@ class TradeResultsScraper:
         if uri_tag is None:
             raise HtmlParsingError('failed to retrieve url to the trade results file')
         uri = uri_tag.attrs['href']
-        trade_results_file_url = 'https://' + URL(self._url).host + '/' + uri
+        return 'https://' + URL(self._url).host + '/' + uri
+
+    async def _get_trade_results(
+            self, file_url: Optional[str] = None) -> pd.DataFrame:
+        """
+        Downloads the latest trade results (or the ones from the given file)
+
+        Raises :class:`aiohttp.ClientResponseError`,
+        :class:`asyncio.TimeoutError`, :class:`HtmlParsingError`
+        """
+
+        if file_url is None:
+            file_url = await self.get_trade_results_file_url()
 
         # download the xl file and compose DataFrame out of it
-        response = await self._requester.request(method='GET',
-                                                 url=trade_results_file_url)
-        response_content = await response.content.read()
+        response = await self._requester.request(method='GET', url=file_url)
+        response_content = await response.read()
         trade_results = pd.read_excel(response_content,
                                       sheet_name='TRADE_SUMMARY')
         return trade_results
@@ -84,14 +98,17 @@ class TradeResultsScraper:
         trade_results['Изменение рыночной цены к цене предыдуего дня, руб'] = \
             pd.to_numeric(trade_results['Изменение рыночной цены к цене предыдуего дня, руб'])
 
-    async def get_all_instruments(self) -> pd.DataFrame:
+    async def get_all_instruments(
+            self, file_url: Optional[str] = None) -> pd.DataFrame:
         """
+        :param file_url: url of trade results file
+        (see :meth:`get_trade_results_file_url`), the latest by default
         :return: DataFrame of all instruments
 
         Raises :class:`aiohttp.ClientResponseError`,
         :class:`asyncio.TimeoutError`, :class:`HtmlParsingError`
         """
-        trade_results = await self._get_trade_results()
+        trade_results = await self._get_trade_results(file_url)
         self._preprocess_trade_results(trade_results)
 
         return trade_results.loc[
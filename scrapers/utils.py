@@ -26,3 +26,30 @@ def load_scraper_config(path: str) -> ScraperConfig:
     with open(path, 'r') as file:
         data = load(file, Loader=SafeLoader)
     return ScraperConfig(**data)
+
+
+def get_calculator_station_name(config: ScraperConfig,
+                                delivery_basis: str) -> Optional[str]:
+    """
+    :return: name of departure station in calculator for the delivery
+    basis or None if it can't be mapped
+    """
+
+    if config.DELIVERY_BASIS_TO_CALCULATOR_STATION_NAME.get(delivery_basis):
+        return config.DELIVERY_BASIS_TO_CALCULATOR_STATION_NAME[delivery_basis]
+    if delivery_basis.startswith('ст. '):
+        return delivery_basis[4:]
+    return None
+
+
+def get_fuel_name(config: ScraperConfig,
+                  instrument_code: str) -> Optional[str]:
+    """
+    :return: fuel name which codes prefix the instrument code
+    or None if there is no such fuel
+    """
+
+    for fuel_name, prefixes in config.FUEL_NAME_TO_INSTRUMENT_CODES.items():
+        if instrument_code.startswith(tuple(prefixes)):
+            return fuel_name
+    return None